@@ -0,0 +1,169 @@
+"""Generador de tiendas sintéticas para los benchmarks.
+
+Crea una carpeta de tienda con la misma estructura que usa la app:
+- consumo_teorico/: `n_daily` CSV diarios (DD-MM-YY.csv) y `n_bulk` semanales
+  (DD-MM-YY_DD-MM-YY.csv) con `n_products` productos y el consumo como texto ('12,34')
+- venta.xlsx: venta real diaria (fecha DD/MM/AAAA, ventas) de `years` años hasta `anchor`
+- venta_estimada/estimacion.csv: venta estimada de los 60 días siguientes ('5 enero 2026')
+- inventario_actual/inventario_real.csv
+- congelado/, fresco/, seco/: pedidos a proveedor con la disposición de infProveedor (nombre en
+  una fila y código/unidades/medida/embalaje en la siguiente) y congelado.csv / fresco.csv
+- ficheros_a_convertir/consumo.xlsx (si `consumo_xls`): informe de consumo teórico sin convertir
+
+Todo sale de `random.Random(seed)`: mismos parámetros, mismos ficheros. Los pedidos a proveedor se
+escriben como .xlsx (para .xls haría falta xlwt); la app lee los dos formatos igual.
+
+    python benchmarks/generate_store.py /tmp/tienda --files 50 --products 5000
+"""
+import argparse
+import random
+import shutil
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+
+import pandas as pd
+
+
+ANCHOR = date(2026, 1, 1)
+MONTHS = ['enero', 'febrero', 'marzo', 'abril', 'mayo', 'junio', 'julio', 'agosto',
+          'septiembre', 'octubre', 'noviembre', 'diciembre']
+UNITS = ['Kilogramo', 'Unidad', 'Litro', 'Gramo']
+# códigos con reglas propias en el pedido (masas, topping, harina, Pepsi, excepciones ZZ/YY)
+SPECIAL_PRODUCTS = [
+    ('BF', 'BOLA FAMILIAR', 'Bola'), ('BM', 'BOLA MEDIANA', 'Bola'), ('BP', 'BOLA PEQUEÑA', 'Bola'),
+    ('EQ', 'MOZZARELLA', 'Kilogramo'), ('HAR', 'SEMOLA DE ROBLE', 'Kilogramo'),
+    ('PSPR1', 'PEPSI 1L', 'Unidad'), ('PSPR3', 'PEPSI LATA', 'Unidad'), ('PSPZ5', 'PEPSI ZERO', 'Unidad'),
+    ('GAMBC', 'ZZ GAMBAS', 'Kilogramo'), ('ZZX', 'ZZ OBSOLETO', 'Unidad'), ('BSA', 'BOLSA', 'Unidad'),
+]
+SUPPLIER_HEADER = {0: 'Artículo', 5: 'Código', 7: 'Unid. Totales', 9: 'Medida', 11: 'Embalaje', 14: 'CANTIDAD ( Envases )'}
+
+
+def _num(v):
+    return f'{v:.2f}'.replace('.', ',')
+
+
+def make_products(n_products, rng):
+    products = list(SPECIAL_PRODUCTS)
+    for i in range(max(0, n_products - len(products))):
+        products.append((f'P{i:05d}', f'PRODUCTO {i}', rng.choice(UNITS)))
+    return products[:max(n_products, len(SPECIAL_PRODUCTS))]
+
+
+def _write_consumo(path: Path, products, factor, rng):
+    rows = []
+    for code, art, unit in products:
+        if rng.random() < 0.1:
+            continue
+        rows.append({'Codigo': code, 'Articulo': art, 'Unidad_de_Medida': unit,
+                     'Consumo': _num(rng.uniform(0, 30) * factor)})
+    pd.DataFrame(rows).to_csv(path, index=False, encoding='utf-8')
+
+
+def _supplier_sheet(path: Path, products, rng):
+    """Pedido a proveedor con la disposición de infProveedor (filas de nombre + detalle)."""
+    width = 16
+    rows = [[None] * width for _ in range(15)]
+    rows[1][0] = 'infProveedor'
+    rows[4][3] = 'Pedido a Proveedor'
+    header = [None] * width
+    for col, text in SUPPLIER_HEADER.items():
+        header[col] = text
+    rows.append(header)
+    for code, art, unit in products:
+        units = rng.choice([1, 2, 5, 6, 12, 24, 45, 50, 180])
+        pack = rng.choice([1, units])
+        name_row = [None] * width
+        name_row[0] = art
+        detail = [None] * width
+        detail[5], detail[7], detail[9], detail[11], detail[12], detail[13], detail[15] = (
+            code, units, unit, pack, 'Unidad', units, unit)
+        rows += [name_row, detail]
+    pd.DataFrame(rows).to_excel(path, header=False, index=False)
+
+
+def _consumo_report(path: Path, day: date, products, rng):
+    """Informe de consumo teórico sin convertir (lo que se sube en 'días sueltos')."""
+    rows = [[None] * 21 for _ in range(6)]
+    rows[1][0] = 'Informe consumo teórico'
+    rows[2][0] = 'Fecha de grabación:'
+    rows[2][3] = day.strftime('%d/%m/%Y') + ' 10:00:00'
+    rows[5] = ['Código', None, 'Artículo'] + [f'H{i}' for i in range(18)]
+    for code, art, unit in products:
+        r = [code, None, art] + [None] * 18
+        r[7] = unit
+        for k in range(8, 21):
+            r[k] = _num(rng.uniform(0, 100)) if rng.random() < 0.8 else None
+        rows.append(r)
+    pd.DataFrame(rows).to_excel(path, header=False, index=False)
+
+
+def build_store(root: Path, n_files=50, n_products=500, years=2, seed=0, anchor=ANCHOR, consumo_xls=False):
+    """Crea (o rehace) la tienda en `root`. Devuelve un dict con el rango de pedido sugerido
+    ('start', 'end': la semana siguiente a `anchor`) y los recuentos generados."""
+    rng = random.Random(seed)
+    root = Path(root)
+    if root.exists():
+        shutil.rmtree(root)
+    for sub in ('consumo_teorico', 'venta_estimada', 'inventario_actual', 'congelado', 'fresco', 'seco',
+                'ficheros_a_convertir'):
+        (root / sub).mkdir(parents=True)
+    products = make_products(n_products, rng)
+
+    # ventas reales: `years` años hasta la víspera de `anchor`; estimadas: 60 días desde `anchor`
+    first_day = anchor - timedelta(days=365 * years)
+    days = [first_day + timedelta(days=k) for k in range((anchor - first_day).days)]
+    pd.DataFrame({'fecha': [d.strftime('%d/%m/%Y') for d in days],
+                  'ventas': [round(rng.uniform(1500, 4000), 2) for _ in days]}).to_excel(root / 'venta.xlsx', index=False)
+    est_days = [anchor + timedelta(days=k) for k in range(60)]
+    pd.DataFrame({'fecha': [f'{d.day} {MONTHS[d.month - 1]} {d.year}' for d in est_days],
+                  'venta_estimada_sin_partido': [round(rng.uniform(1500, 4000), 2) for _ in est_days]}).to_csv(
+        root / 'venta_estimada' / 'estimacion.csv', index=False, encoding='utf-8-sig')
+
+    # consumo: 80% diarios (los días previos a anchor) y 20% semanales (antes de los diarios)
+    n_bulk = n_files // 5
+    n_daily = n_files - n_bulk
+    cons_dir = root / 'consumo_teorico'
+    for k in range(n_daily):
+        d = anchor - timedelta(days=n_daily - k)
+        _write_consumo(cons_dir / (d.strftime('%d-%m-%y') + '.csv'), products, 1, rng)
+    for b in range(n_bulk):
+        end = anchor - timedelta(days=n_daily + 1 + 7 * b)
+        start = end - timedelta(days=6)
+        _write_consumo(cons_dir / f"{start.strftime('%d-%m-%y')}_{end.strftime('%d-%m-%y')}.csv", products, 7, rng)
+
+    inv = [{'Codigo': c, 'Articulo': a, 'Unidad_de_Medida': u, 'Real': _num(rng.uniform(0, 80))}
+           for c, a, u in products if rng.random() >= 0.15]
+    pd.DataFrame(inv).to_csv(root / 'inventario_actual' / 'inventario_real.csv', index=False, encoding='utf-8')
+
+    # maestro: un tercio de productos por sección; congelado.csv / fresco.csv con sus códigos
+    sections = {'congelado': products[0::3], 'fresco': products[1::3], 'seco': products[2::3]}
+    for name, prods in sections.items():
+        _supplier_sheet(root / name / f'1_1_2026_000000_infProveedor.xlsx', prods, rng)
+        if name != 'seco':
+            pd.DataFrame([{'Codigo': c, 'Articulo': a} for c, a, _ in prods]).to_csv(root / f'{name}.csv', index=False)
+
+    if consumo_xls:
+        _consumo_report(root / 'ficheros_a_convertir' / 'consumo.xlsx', anchor - timedelta(days=1), products, rng)
+
+    return {'start': anchor, 'end': anchor + timedelta(days=6), 'files': n_daily + n_bulk,
+            'daily': n_daily, 'bulk': n_bulk, 'products': len(products), 'sales_days': len(days)}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='Genera una tienda sintética para benchmarks.')
+    ap.add_argument('root', type=Path)
+    ap.add_argument('--files', type=int, default=50, help='ficheros de consumo_teorico (80%% diarios, 20%% semanales)')
+    ap.add_argument('--products', type=int, default=500)
+    ap.add_argument('--years', type=int, default=2, help='años de venta real en venta.xlsx')
+    ap.add_argument('--seed', type=int, default=0)
+    ap.add_argument('--consumo-xls', action='store_true', help='añadir un informe de consumo sin convertir')
+    args = ap.parse_args(argv)
+    info = build_store(args.root, args.files, args.products, args.years, args.seed, consumo_xls=args.consumo_xls)
+    print(f"{args.root}: {info['files']} ficheros, {info['products']} productos, "
+          f"pedido sugerido {info['start']}..{info['end']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,202 @@
+"""Benchmarks del cálculo del pedido sobre tiendas sintéticas (`benchmarks/generate_store.py`).
+
+Para cada escala (ficheros de consumo x productos) se genera una tienda y se mide:
+- parse_xls: conversión de un informe de consumo XLSX (`parse_consumo_file`)
+- ventas: venta.xlsx + venta_estimada + calendario + resumen del rango, sin cachés
+- seleccion: candidatos y búsqueda del subconjunto de ficheros (`select_subset`)
+- agregacion_fria: cubo de consumos leyendo los CSV (sin copias .parquet ni caché) + suma
+- agregacion: suma de los ficheros elegidos con el cubo ya cargado
+- pedido_frio / pedido: `compute_order` completo sin cachés y con cachés
+
+Cada medida se repite `--repeat` veces (mínimo y mediana). El resultado es un JSON con el commit,
+las versiones y las medidas; con `--baseline` se compara contra otro JSON.
+
+    python benchmarks/run_benchmarks.py --files 10,50,200 --products 500,5000
+    python benchmarks/run_benchmarks.py --quick --baseline benchmarks/results/anterior.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+base = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(base))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import numpy as np
+import pandas as pd
+
+from generate_store import build_store
+from scripts import consumo_cube, sales_calendar, sales_utils
+from scripts.consumo_store import SIDECAR_SUFFIX
+from scripts.convert import parse_consumo_file
+from scripts.order_engine import _candidates, _item_entries, compute_order
+from scripts.sales_calendar import count_weekday, load_calendar
+from scripts.sales_utils import load_estimated_sales, load_real_sales, summarize_range
+from scripts.consumo_cube import aggregate, load_cube
+from scripts.selector import select_subset
+
+
+RESULTS_DIR = Path(__file__).resolve().parent / 'results'
+DEFAULT_FILES = (10, 50, 200)
+DEFAULT_PRODUCTS = (500, 5000)
+
+
+def clear_caches(store: Path):
+    """Olvida las cachés de módulo y borra las copias .parquet (lectura en frío)."""
+    for module in (sales_utils, sales_calendar, consumo_cube):
+        module._CACHE.clear()
+    for folder in ('consumo_teorico', 'inventario_actual'):
+        for side in (store / folder).glob('*' + SIDECAR_SUFFIX):
+            side.unlink()
+
+
+def measure(func, repeat, setup=None):
+    """Segundos de cada una de las `repeat` llamadas (`setup` se ejecuta antes, sin medir)."""
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        t0 = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - t0)
+    return times
+
+
+def _selection(store, start, end):
+    real, estim = load_real_sales(store), load_estimated_sales(store)
+    res = summarize_range(store, start, end)
+    candidates = _candidates(sorted((store / 'consumo_teorico').glob('*.csv')), load_calendar(real, estim))
+    required = count_weekday(start, end, 3)
+    active = _item_entries(candidates, required)
+    return select_subset([int(round(c[2] * 100)) for c in active], [c[3] for c in active],
+                         int(round(res['total'] * 100)), required)
+
+
+def bench_scale(workdir: Path, n_files, n_products, repeat, seed=0):
+    store = workdir / f'tienda_f{n_files}_p{n_products}'
+    t0 = time.perf_counter()
+    info = build_store(store, n_files, n_products, seed=seed, consumo_xls=True)
+    gen_seconds = time.perf_counter() - t0
+    start, end = info['start'], info['end']
+    cons_dir = store / 'consumo_teorico'
+    report = store / 'ficheros_a_convertir' / 'consumo.xlsx'
+    cold = lambda: clear_caches(store)
+
+    # calentar: copias .parquet y cachés para las medidas "calientes"
+    results, _messages = compute_order(store, start, end)
+    chosen = [cons_dir / name for name in results['chosen_files']]
+
+    stages = {
+        'parse_xls': (lambda: parse_consumo_file(report), None),
+        'ventas': (lambda: (summarize_range(store, start, end),
+                            load_calendar(load_real_sales(store), load_estimated_sales(store))), cold),
+        'seleccion': (lambda: _selection(store, start, end), None),
+        'agregacion_fria': (lambda: aggregate(load_cube(cons_dir), chosen), cold),
+        'agregacion': (lambda: aggregate(load_cube(cons_dir), chosen), None),
+        'pedido_frio': (lambda: compute_order(store, start, end), cold),
+        'pedido': (lambda: compute_order(store, start, end), None),
+    }
+    rows = []
+    for name, (func, setup) in stages.items():
+        if setup is None:
+            func()
+        times = measure(func, repeat, setup)
+        rows.append({
+            'ficheros': n_files,
+            'productos': n_products,
+            'etapa': name,
+            'min_s': round(min(times), 6),
+            'mediana_s': round(statistics.median(times), 6),
+            'repeticiones': repeat,
+        })
+        print(f"  {name:<16} min {min(times):8.4f} s  mediana {statistics.median(times):8.4f} s")
+    return {'ficheros': n_files, 'productos': n_products, 'generacion_s': round(gen_seconds, 3),
+            'ficheros_elegidos': len(chosen), 'etapas': rows}
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=base, capture_output=True, text=True, timeout=10)
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def compare(current, baseline):
+    """Tabla etapa x escala con el cociente actual/base de las medianas (< 1 es más rápido)."""
+    old = {(r['ficheros'], r['productos'], r['etapa']): r['mediana_s']
+           for scale in baseline.get('escalas', []) for r in scale['etapas']}
+    print(f"\nComparación con {baseline.get('commit')} ({baseline.get('fecha')}):")
+    for scale in current['escalas']:
+        for r in scale['etapas']:
+            before = old.get((r['ficheros'], r['productos'], r['etapa']))
+            if before:
+                print(f"  f={r['ficheros']:<4} p={r['productos']:<5} {r['etapa']:<16} "
+                      f"{before:8.4f} -> {r['mediana_s']:8.4f} s  x{r['mediana_s'] / before:.2f}")
+
+
+def _int_list(text):
+    return [int(x) for x in text.split(',') if x.strip()]
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='Benchmarks del pedido sobre tiendas sintéticas.')
+    ap.add_argument('--files', type=_int_list, default=list(DEFAULT_FILES), help='p. ej. 10,50,200')
+    ap.add_argument('--products', type=_int_list, default=list(DEFAULT_PRODUCTS), help='p. ej. 500,5000')
+    ap.add_argument('--repeat', type=int, default=3)
+    ap.add_argument('--seed', type=int, default=0)
+    ap.add_argument('--quick', action='store_true', help='solo 10 ficheros x 500 productos')
+    ap.add_argument('--workdir', type=Path, default=None, help='carpeta para las tiendas (por defecto temporal)')
+    ap.add_argument('--out', type=Path, default=None, help='JSON de salida (por defecto benchmarks/results/)')
+    ap.add_argument('--baseline', type=Path, default=None, help='JSON de una ejecución anterior para comparar')
+    args = ap.parse_args(argv)
+    if args.quick:
+        args.files, args.products = [10], [500]
+
+    tmp = None
+    workdir = args.workdir
+    if workdir is None:
+        tmp = tempfile.TemporaryDirectory(prefix='pedido-bench-')
+        workdir = Path(tmp.name)
+    workdir.mkdir(parents=True, exist_ok=True)
+
+    commit = _git_commit()
+    payload = {
+        'commit': commit,
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'plataforma': platform.platform(),
+        'cpus': os.cpu_count(),
+        'semilla': args.seed,
+        'escalas': [],
+    }
+    try:
+        for n_files in args.files:
+            for n_products in args.products:
+                print(f'{n_files} ficheros x {n_products} productos')
+                payload['escalas'].append(bench_scale(workdir, n_files, n_products, args.repeat, args.seed))
+    finally:
+        if tmp is not None:
+            tmp.cleanup()
+
+    out = args.out or RESULTS_DIR / f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{commit or 'sin-commit'}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding='utf-8')
+    print(f'\nResultados: {out}')
+    if args.baseline:
+        compare(payload, json.loads(args.baseline.read_text(encoding='utf-8')))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
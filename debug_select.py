@@ -1,6 +1,8 @@
 from pathlib import Path
-from datetime import datetime as _dt, date, timedelta
+from datetime import date
+from scripts.consumo_catalog import parse_fname_dates
 from scripts.sales_utils import load_real_sales, load_estimated_sales, summarize_range
+from scripts.sales_calendar import load_calendar, range_total, day_value, count_weekday
 
 base = Path('.')
 start_sel = date(2026,2,1)
@@ -11,70 +13,29 @@ print('Range total combined:', res['total'])
 consumo_dir = base / 'consumo_teorico'
 files = sorted(consumo_dir.glob('*.csv'))
 
-from datetime import timedelta as _td
-from datetime import datetime as _dt
-
-# parse filenames
-def parse_fname_dates(p: Path):
-    stem = p.stem
-    if '_' in stem:
-        parts = stem.split('_')
-        if len(parts) >= 2:
-            try:
-                start = _dt.strptime(parts[0], '%d-%m-%y').date()
-                end = _dt.strptime(parts[1], '%d-%m-%y').date()
-                return (start, end)
-            except Exception:
-                return None
-    try:
-        return _dt.strptime(stem, '%d-%m-%y').date()
-    except Exception:
-        return None
-
 real_sales = load_real_sales(base)
 ests_map = load_estimated_sales(base)
 
+cal = load_calendar(real_sales, ests_map)
+
 candidates = []
 for f in files:
     parsed = parse_fname_dates(f)
     if parsed is None:
         continue
-    has_thursday = False
     if isinstance(parsed, tuple):
         s,e = parsed
-        t = s
-        sumv = 0.0
-        while t <= e:
-            if t.weekday() == 3:
-                has_thursday = True
-            if t in real_sales:
-                sumv += float(real_sales[t])
-            elif t in ests_map:
-                sumv += float(ests_map[t])
-            t = t + timedelta(days=1)
-        candidates.append((f, (s,e), sumv, has_thursday))
+        candidates.append((f, (s,e), range_total(cal, s, e), count_weekday(s, e, 3) > 0))
     else:
         d = parsed
-        v = 0.0
-        if d in real_sales:
-            v = float(real_sales[d])
-        elif d in ests_map:
-            v = float(ests_map[d])
-        if d.weekday() == 3:
-            has_thursday = True
-        candidates.append((f, d, v, has_thursday))
+        candidates.append((f, d, day_value(cal, d), d.weekday() == 3))
 
 print('Candidates with has_thursday:')
 for c in candidates:
     print(c[0].name, c[1], c[3])
 
 # determine required thursdays in range
-cur = start_sel
-req_th = 0
-while cur <= end_sel:
-    if cur.weekday() == 3:
-        req_th += 1
-    cur = cur + _td(days=1)
+req_th = count_weekday(start_sel, end_sel, 3)
 print('Required Thursdays:', req_th)
 
 # build item_entries per app logic (counting th in file ranges irrespective of range)
@@ -83,12 +44,7 @@ for c in candidates:
     f, d_or_r, v, has_th = c
     if isinstance(d_or_r, tuple):
         s,e = d_or_r
-        cur = s
-        th_count = 0
-        while cur <= e:
-            if cur.weekday() == 3:
-                th_count += 1
-            cur = cur + _td(days=1)
+        th_count = count_weekday(s, e, 3)
         item_entries.append((f, d_or_r, v, th_count, True))
     else:
         d = d_or_r
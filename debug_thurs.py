@@ -1,5 +1,6 @@
 from pathlib import Path
-from datetime import datetime as _dt, date, timedelta
+from datetime import date, timedelta
+from scripts.consumo_catalog import parse_fname_dates
 from scripts.sales_utils import load_real_sales, load_estimated_sales
 
 base = Path('.')
@@ -28,22 +29,6 @@ files = sorted(consumo_dir.glob('*.csv'))
 
 print('\nFound files:', len(files))
 
-def parse_fname_dates(p: Path):
-    stem = p.stem
-    if '_' in stem:
-        parts = stem.split('_')
-        if len(parts) >= 2:
-            try:
-                start = _dt.strptime(parts[0], '%d-%m-%y').date()
-                end = _dt.strptime(parts[1], '%d-%m-%y').date()
-                return (start, end)
-            except Exception:
-                return None
-    try:
-        return _dt.strptime(stem, '%d-%m-%y').date()
-    except Exception:
-        return None
-
 candidates = []
 for f in files:
     parsed = parse_fname_dates(f)
@@ -0,0 +1,161 @@
+"""Pedidos de varias tiendas a la vez (una carpeta por tienda).
+
+Cada tienda es una carpeta con su `consumo_teorico/`, `venta.xlsx`, `venta_estimada/`,
+`inventario_actual/` y maestros (congelado/fresco/seco). Para cada una se ejecuta
+`scripts.order_engine.compute_order` en un `ProcessPoolExecutor` y sus tablas se escriben en
+`<out>/<tienda>/`; en `<out>/` queda el resumen de todas (resumen_tiendas.csv y .json) con el
+tiempo de cada tienda y los errores.
+
+    python -m scripts.batch_orders --start 2026-02-02 --end 2026-02-09 --out pedidos/ tiendas/*
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date
+from pathlib import Path
+
+import pandas as pd
+
+from scripts.order_engine import compute_order, write_outputs
+
+
+SUMMARY_COLUMNS = ['Tienda', 'Carpeta', 'Estado', 'Segundos', 'Productos_a_pedir', 'Total_a_pedir',
+                   'Venta_rango', 'Venta_ficheros', 'Ficheros', 'Avisos', 'Error']
+
+
+def store_roots(patterns):
+    """Carpetas de tienda (con consumo_teorico/) a partir de rutas o patrones glob, sin repetir."""
+    roots = []
+    seen = set()
+    for pattern in patterns:
+        matches = glob.glob(os.path.expanduser(pattern)) or [pattern]
+        for m in sorted(matches):
+            p = Path(m)
+            key = p.resolve()
+            if p.is_dir() and (p / 'consumo_teorico').is_dir() and key not in seen:
+                seen.add(key)
+                roots.append(p)
+    return roots
+
+
+def _out_names(roots):
+    """Subcarpeta de salida de cada tienda: su nombre (con sufijo si se repite)."""
+    names = []
+    used = {}
+    for root in roots:
+        name = root.resolve().name or 'tienda'
+        used[name] = used.get(name, 0) + 1
+        names.append(name if used[name] == 1 else f'{name}_{used[name]}')
+    return names
+
+
+def run_store(root, out_dir, start: date, end: date, avoid_thurs=False, fmt='csv'):
+    """Pedido de una tienda; nunca lanza excepción: los fallos vuelven en 'Error'."""
+    t0 = time.perf_counter()
+    row = {'Tienda': Path(out_dir).name, 'Carpeta': str(root)}
+    try:
+        results, messages = compute_order(Path(root), start, end, avoid_thurs=avoid_thurs)
+        write_outputs(results, messages, out_dir, fmt)
+        row['Avisos'] = ' | '.join(f'[{lvl}] {txt}' for lvl, txt in messages)
+        if results is None:
+            row['Estado'] = 'SIN_PEDIDO'
+        else:
+            qty = pd.to_numeric(results['order_df']['Cantidad_a_pedir'], errors='coerce').fillna(0)
+            row.update({
+                'Estado': 'OK',
+                'Productos_a_pedir': int((qty > 0).sum()),
+                'Total_a_pedir': float(qty.sum()),
+                'Venta_rango': float(results['summary'].get('total', 0.0)),
+                'Venta_ficheros': float(results['chosen_sales_total']),
+                'Ficheros': ', '.join(results['chosen_files']),
+            })
+    except Exception as e:
+        row['Estado'] = 'ERROR'
+        row['Error'] = f'{type(e).__name__}: {e}'
+        row['Traza'] = traceback.format_exc()
+    row['Segundos'] = round(time.perf_counter() - t0, 3)
+    return row
+
+
+def run_batch(roots, out_dir: Path, start: date, end: date, avoid_thurs=False, fmt='csv', workers=1):
+    """Ejecuta `run_store` para cada tienda y va devolviendo su fila de resumen según termina.
+    Con `workers` > 1 usa procesos; si el pool no se puede crear o un proceso muere, esas
+    tiendas se hacen en secuencial."""
+    out_dir = Path(out_dir)
+    jobs = [(root, out_dir / name) for root, name in zip(roots, _out_names(roots))]
+    pending = list(range(len(jobs)))
+    if workers and workers > 1 and len(jobs) > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+                futures = {pool.submit(run_store, str(jobs[i][0]), str(jobs[i][1]), start, end, avoid_thurs, fmt): i
+                           for i in pending}
+                for fut in as_completed(futures):
+                    idx = futures[fut]
+                    try:
+                        row = fut.result()
+                    except Exception:
+                        # el proceso hijo murió; se reintenta en secuencial más abajo
+                        continue
+                    pending.remove(idx)
+                    yield row
+        except Exception:
+            # sin soporte de procesos: continuar en secuencial
+            pass
+    for idx in list(pending):
+        pending.remove(idx)
+        yield run_store(jobs[idx][0], jobs[idx][1], start, end, avoid_thurs, fmt)
+
+
+def write_summary(rows, out_dir: Path, start: date, end: date, wall_seconds: float):
+    """resumen_tiendas.csv (una fila por tienda) y resumen_tiendas.json (con trazas de error)."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    rows = sorted(rows, key=lambda r: r['Tienda'])
+    pd.DataFrame(rows, columns=SUMMARY_COLUMNS).to_csv(out_dir / 'resumen_tiendas.csv', index=False, encoding='utf-8')
+    payload = {
+        'inicio': start.isoformat(),
+        'fin': end.isoformat(),
+        'tiendas': len(rows),
+        'ok': sum(1 for r in rows if r['Estado'] == 'OK'),
+        'errores': sum(1 for r in rows if r['Estado'] == 'ERROR'),
+        'segundos_total': round(wall_seconds, 3),
+        'detalle': rows,
+    }
+    (out_dir / 'resumen_tiendas.json').write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding='utf-8')
+    return payload
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='Calcula el pedido de varias tiendas en paralelo.')
+    ap.add_argument('stores', nargs='+', help='carpetas de tienda o patrones glob (p. ej. "tiendas/*")')
+    ap.add_argument('--start', type=date.fromisoformat, required=True, help='primer día del rango (AAAA-MM-DD)')
+    ap.add_argument('--end', type=date.fromisoformat, required=True, help='último día del rango (AAAA-MM-DD)')
+    ap.add_argument('--out', type=Path, required=True, help='carpeta de salida (una subcarpeta por tienda)')
+    ap.add_argument('--workers', type=int, default=max(1, min(4, os.cpu_count() or 1)))
+    ap.add_argument('--format', choices=('csv', 'json'), default='csv')
+    ap.add_argument('--avoid-thursdays', action='store_true', help='evitar ficheros con jueves cuando sea posible')
+    args = ap.parse_args(argv)
+
+    roots = store_roots(args.stores)
+    if not roots:
+        print('No se encontró ninguna carpeta de tienda con consumo_teorico/.', file=sys.stderr)
+        return 2
+    t0 = time.perf_counter()
+    rows = []
+    for row in run_batch(roots, args.out, args.start, args.end, args.avoid_thursdays, args.format, args.workers):
+        rows.append(row)
+        detail = row.get('Error') or f"{row.get('Productos_a_pedir', 0)} productos"
+        print(f"{row['Tienda']}: {row['Estado']} en {row['Segundos']:.2f} s ({detail})")
+    payload = write_summary(rows, args.out, args.start, args.end, time.perf_counter() - t0)
+    print(f"{payload['ok']}/{payload['tiendas']} tiendas OK, {payload['errores']} con error, "
+          f"{payload['segundos_total']:.2f} s en total -> {Path(args.out) / 'resumen_tiendas.csv'}")
+    return 1 if payload['errores'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
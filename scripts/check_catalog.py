@@ -0,0 +1,121 @@
+"""Comprueba `scripts.consumo_catalog` contra la expansión día a día de cada fichero (los conjuntos
+`covers` que usaban los scripts de depuración): ficheros que cubren un rango, ficheros dentro de un
+rango, días y jueves de cada entrada, jueves de una lista de ficheros y reparto por día de la
+semana. También que el catálogo incremental (`load_catalog` tras añadir y borrar ficheros)
+coincide con uno construido de cero, y mide las consultas.
+
+Uso: python scripts/check_catalog.py [n_casos]
+"""
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+base = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(base))
+from scripts.consumo_catalog import (  # noqa: E402
+    build_catalog, count_thursdays, files_covering, files_within, load_catalog, make_entry, weekday_counts,
+)
+
+
+def random_name(rng, origin):
+    start = origin + timedelta(days=rng.randint(0, 120))
+    if rng.random() < 0.6:
+        return start.strftime('%d-%m-%y') + '.csv'
+    end = start + timedelta(days=rng.randint(0, 13))
+    return f"{start.strftime('%d-%m-%y')}_{end.strftime('%d-%m-%y')}.csv"
+
+
+def covers(name):
+    e = make_entry(name)
+    d, out = e['inicio'], set()
+    while d <= e['fin']:
+        out.add(d)
+        d += timedelta(days=1)
+    return out
+
+
+def check_case(rng):
+    origin = date(2025, 1, 1) + timedelta(days=rng.randint(0, 365))
+    names = sorted({random_name(rng, origin) for _ in range(rng.randint(0, 40))} | {'notas.csv'})
+    cat = build_catalog(make_entry(n) for n in names)
+    days = {n: covers(n) for n in names if make_entry(n) is not None}
+    problems = []
+    for e in cat['entries']:
+        ds = days[e['fichero']]
+        if e['dias'] != len(ds) or e['jueves'] != sum(1 for d in ds if d.weekday() == 3):
+            problems.append(('entrada', e['fichero']))
+        if e['rango'] != ('_' in e['fichero']):
+            problems.append(('rango', e['fichero']))
+    for _ in range(20):
+        s = origin + timedelta(days=rng.randint(-10, 140))
+        e = s + timedelta(days=rng.randint(-1, 20))
+        rng_days = {s + timedelta(days=k) for k in range((e - s).days + 1)}
+        want = {n for n, ds in days.items() if ds & rng_days}
+        if set(files_covering(cat, s, e)) != want:
+            problems.append(('covering', s, e))
+        want = {n for n, ds in days.items() if ds and ds <= rng_days}
+        if set(files_within(cat, s, e)) != want:
+            problems.append(('within', s, e))
+    picked = [rng.choice(names) for _ in range(rng.randint(0, 8))]
+    want_th = sum(sum(1 for d in days.get(n, ()) if d.weekday() == 3) for n in picked)
+    if count_thursdays(picked, cat) != want_th or count_thursdays(picked) != want_th:
+        problems.append(('jueves', picked))
+    want_week = tuple(sum(1 for n in days for d in days[n] if d.weekday() == w) for w in range(7))
+    if weekday_counts(cat) != want_week or weekday_counts(cat, list(days)) != want_week:
+        problems.append(('semana',))
+    return problems
+
+
+def check_incremental(rng):
+    with tempfile.TemporaryDirectory(prefix='pedido-catalogo-') as tmp:
+        folder = Path(tmp)
+        origin = date(2025, 6, 1)
+        for _ in range(5):
+            for _ in range(rng.randint(0, 10)):
+                (folder / random_name(rng, origin)).write_text('Codigo\n', encoding='utf-8')
+            for f in rng.sample(sorted(folder.glob('*.csv')), k=min(2, len(list(folder.glob('*.csv'))))):
+                if rng.random() < 0.5:
+                    f.unlink()
+            inc = load_catalog(folder)
+            fresh = build_catalog(make_entry(f) for f in folder.glob('*.csv'))
+            if inc['entries'] != fresh['entries']:
+                return False
+    return True
+
+
+def main():
+    n_cases = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    rng = random.Random(0)
+    failures = 0
+    for case in range(n_cases):
+        problems = check_case(rng)
+        if problems:
+            failures += 1
+            print(f'caso {case}: {problems[:3]}')
+    for _ in range(20):
+        if not check_incremental(rng):
+            failures += 1
+            print('catálogo incremental distinto del construido de cero')
+            break
+    print(f'{n_cases} casos aleatorios + incremental: {failures} fallos')
+
+    # consultas sobre ~3 años de ficheros diarios y semanales
+    origin = date(2023, 1, 1)
+    names = [(origin + timedelta(days=k)).strftime('%d-%m-%y') + '.csv' for k in range(1100)]
+    names += [f"{(origin + timedelta(days=k)).strftime('%d-%m-%y')}_{(origin + timedelta(days=k + 6)).strftime('%d-%m-%y')}.csv"
+              for k in range(0, 1100, 7)]
+    t0 = time.perf_counter()
+    cat = build_catalog(make_entry(n) for n in names)
+    t1 = time.perf_counter()
+    for k in range(1000):
+        files_covering(cat, origin + timedelta(days=k), origin + timedelta(days=k + 6))
+    t2 = time.perf_counter()
+    print(f'{len(names)} ficheros: catálogo {t1 - t0:.4f} s, 1000 consultas {t2 - t1:.4f} s')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
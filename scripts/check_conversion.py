@@ -0,0 +1,77 @@
+"""Comprueba la conversión de consumos con manifiesto (`scripts.convert.convert_consumo_files`)
+cuando varios ficheros generan el mismo CSV: en cada ejecución debe prevalecer el último de la
+lista y, a partir de la segunda, nada debe volver a parsearse (todo 'CACHED'), también si se
+convierte en paralelo.
+
+Uso: python scripts/check_conversion.py [ejecuciones]
+"""
+import sys
+import tempfile
+from datetime import date
+from pathlib import Path
+
+import pandas as pd
+
+base = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(base))
+from scripts.convert import convert_consumo_files  # noqa: E402
+
+
+def consumo_report(path: Path, day: date, value: str):
+    """Informe de consumo teórico mínimo (mismo formato que el que se sube en 'días sueltos')."""
+    rows = [[None] * 21 for _ in range(6)]
+    rows[1][0] = 'Informe consumo teórico'
+    rows[2][0] = 'Fecha de grabación:'
+    rows[2][3] = day.strftime('%d/%m/%Y') + ' 10:00:00'
+    rows[5] = ['Código', None, 'Artículo'] + [f'H{i}' for i in range(18)]
+    r = ['AB', None, 'PRODUCTO AB'] + [None] * 18
+    r[7] = 'Kilogramo'
+    r[8:21] = [value] * 13
+    rows.append(r)
+    pd.DataFrame(rows).to_excel(path, header=False, index=False)
+
+
+def check(runs, workers):
+    problems = []
+    with tempfile.TemporaryDirectory(prefix='pedido-conversion-') as tmp:
+        tmp = Path(tmp)
+        day = date(2025, 12, 20)
+        sources = [tmp / 'a.xlsx', tmp / 'b.xlsx', tmp / 'c.xlsx']
+        consumo_report(sources[0], day, '66,97')
+        consumo_report(sources[1], day, '2,83')
+        consumo_report(sources[2], date(2025, 12, 21), '1,00')
+        dst, manifest = tmp / 'consumo_teorico', tmp / 'manifest.json'
+        expected = None
+        for run in range(runs):
+            results = list(convert_consumo_files(sources, dst, workers=workers, manifest_path=manifest))
+            statuses = {name: status for name, status, _detail in results}
+            content = (dst / '20-12-25.csv').read_text(encoding='utf-8')
+            if run == 0:
+                expected = content
+                if 'SAVED' not in statuses.values():
+                    problems.append(f'ejecución 0: nada convertido {results}')
+            elif content != expected:
+                problems.append(f'ejecución {run}: 20-12-25.csv cambió de contenido')
+            if run > 0 and set(statuses.values()) != {'CACHED'}:
+                problems.append(f'ejecución {run}: se volvió a parsear {results}')
+        # debe prevalecer b.xlsx (posterior en la lista)
+        one = list(convert_consumo_files(sources[1:2], tmp / 'solo_b', workers=1))
+        if one and (tmp / 'solo_b' / '20-12-25.csv').read_text(encoding='utf-8') != expected:
+            problems.append('20-12-25.csv no es el de b.xlsx')
+    return problems
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    failures = 0
+    for workers in (1, 2):
+        problems = check(runs, workers)
+        for p in problems:
+            print(f'workers={workers}: {p}')
+        failures += len(problems)
+    print(f'{runs} ejecuciones x (secuencial, paralelo): {failures} fallos')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,185 @@
+"""Comprueba que el pedido no cambia: ejecuta `scripts.order_engine.compute_order` sobre las tiendas
+congeladas de golden/stores y compara cada tabla de salida, celda a celda, con las guardadas en
+golden/expected/<caso>/ (mismas tablas que escribe la línea de órdenes más resumen.json).
+
+Los casos están en golden/cases.json. Los números se comparan con tolerancia (`--atol`, `--rtol`;
+por defecto prácticamente exacta) y el resto de celdas exactamente. Cada tienda se copia a una
+carpeta temporal antes de calcular (el motor escribe copias .parquet junto a los CSV).
+
+Uso: python scripts/check_golden.py [caso ...] [--update] [--db] [--atol 1e-9] [--rtol 1e-9]
+--update reescribe los ficheros esperados con la salida actual (solo tras revisar el cambio).
+--db calcula desde la base SQLite (`scripts.local_db`) en lugar de leer las carpetas.
+"""
+import argparse
+import io
+import json
+import shutil
+import sys
+import tempfile
+from datetime import date
+from pathlib import Path
+
+base = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(base))
+
+import numpy as np
+import pandas as pd
+
+from scripts import local_db
+from scripts.order_engine import compute_order, output_tables
+
+
+GOLDEN_DIR = base / 'golden'
+CASES_PATH = GOLDEN_DIR / 'cases.json'
+# claves de resumen.json que forman parte del resultado (los tiempos no)
+SUMMARY_KEYS = ('messages', 'summary', 'summary_masas', 'chosen_files', 'chosen_thurs', 'chosen_sales_total',
+                'diff_sales', 'colchon_extra_str')
+MAX_REPORTED = 10
+
+
+def load_cases(path: Path = CASES_PATH):
+    return json.loads(Path(path).read_text(encoding='utf-8'))
+
+
+def run_case(case, use_db=False):
+    """(tablas como CSV de texto, resumen) del caso, calculado sobre una copia de su tienda."""
+    with tempfile.TemporaryDirectory(prefix='pedido-golden-') as tmp:
+        store = Path(tmp) / case['store']
+        shutil.copytree(GOLDEN_DIR / 'stores' / case['store'], store)
+        db = None
+        if use_db:
+            db = local_db.db_path(store)
+            local_db.sync(store, db)
+        results, messages = compute_order(store, date.fromisoformat(case['start']), date.fromisoformat(case['end']),
+                                          avoid_thurs=case.get('avoid_thursdays', False), db=db)
+    tables = {}
+    summary = {'messages': [[lvl, txt] for lvl, txt in messages]}
+    if results is not None:
+        for name, df in output_tables(results).items():
+            tables[name] = df.to_csv(index=False, lineterminator='\n')
+        summary.update({key: results[key] for key in SUMMARY_KEYS if key in results})
+    summary = json.loads(json.dumps(summary, ensure_ascii=False, default=str))
+    return tables, summary
+
+
+def _frame(csv_text):
+    return pd.read_csv(io.StringIO(csv_text), keep_default_na=True)
+
+
+def _row_label(df, i):
+    if 'Codigo' in df.columns:
+        return f"fila {i} (Codigo={df['Codigo'].iloc[i]})"
+    return f'fila {i}'
+
+
+def diff_table(expected_csv, actual_csv, atol, rtol):
+    """Diferencias (texto) entre dos tablas: columnas, filas y celdas."""
+    exp, act = _frame(expected_csv), _frame(actual_csv)
+    if list(exp.columns) != list(act.columns):
+        return [f'columnas: esperado {list(exp.columns)}, obtenido {list(act.columns)}']
+    out = []
+    if len(exp) != len(act):
+        out.append(f'filas: esperado {len(exp)}, obtenido {len(act)}')
+    n = min(len(exp), len(act))
+    for col in exp.columns:
+        e, a = exp[col].iloc[:n], act[col].iloc[:n]
+        if pd.api.types.is_numeric_dtype(e) and pd.api.types.is_numeric_dtype(a):
+            ev, av = e.to_numpy(dtype=float), a.to_numpy(dtype=float)
+            same = np.isclose(av, ev, atol=atol, rtol=rtol, equal_nan=True)
+        else:
+            ev, av = e.to_numpy(dtype=object), a.to_numpy(dtype=object)
+            same = np.array([(x == y) or (pd.isna(x) and pd.isna(y)) for x, y in zip(ev, av)], dtype=bool)
+        ev, av = ev.tolist(), av.tolist()
+        for i in np.flatnonzero(~same):
+            out.append(f'{_row_label(exp, i)}, {col}: esperado {ev[i]!r}, obtenido {av[i]!r}')
+    return out
+
+
+def _close(a, b, atol, rtol):
+    if isinstance(a, (int, float)) and isinstance(b, (int, float)) and not isinstance(a, bool):
+        return bool(np.isclose(b, a, atol=atol, rtol=rtol))
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(_close(a[k], b[k], atol, rtol) for k in a)
+    if isinstance(a, list) and isinstance(b, list):
+        return len(a) == len(b) and all(_close(x, y, atol, rtol) for x, y in zip(a, b))
+    return a == b
+
+
+def diff_summary(expected, actual, atol, rtol):
+    out = []
+    for key in sorted(set(expected) | set(actual)):
+        if not _close(expected.get(key), actual.get(key), atol, rtol):
+            out.append(f'{key}: esperado {expected.get(key)!r}, obtenido {actual.get(key)!r}')
+    return out
+
+
+def check_case(case, atol, rtol, use_db=False):
+    """Lista de diferencias del caso (vacía si coincide)."""
+    exp_dir = GOLDEN_DIR / 'expected' / case['name']
+    if not exp_dir.exists():
+        return [f'sin ficheros esperados en {exp_dir} (ejecutar con --update)']
+    tables, summary = run_case(case, use_db)
+    problems = []
+    expected_names = sorted(p.stem for p in exp_dir.glob('*.csv'))
+    if expected_names != sorted(tables):
+        problems.append(f'tablas: esperado {expected_names}, obtenido {sorted(tables)}')
+    for name in sorted(set(expected_names) & set(tables)):
+        diffs = diff_table((exp_dir / f'{name}.csv').read_text(encoding='utf-8'), tables[name], atol, rtol)
+        problems += [f'{name}: {d}' for d in diffs]
+    expected_summary = json.loads((exp_dir / 'resumen.json').read_text(encoding='utf-8'))
+    problems += [f'resumen: {d}' for d in diff_summary(expected_summary, summary, atol, rtol)]
+    return problems
+
+
+def update_case(case):
+    exp_dir = GOLDEN_DIR / 'expected' / case['name']
+    if exp_dir.exists():
+        shutil.rmtree(exp_dir)
+    exp_dir.mkdir(parents=True)
+    tables, summary = run_case(case)
+    for name, text in tables.items():
+        (exp_dir / f'{name}.csv').write_text(text, encoding='utf-8')
+    (exp_dir / 'resumen.json').write_text(json.dumps(summary, ensure_ascii=False, indent=2) + '\n', encoding='utf-8')
+    return sorted(tables)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='Compara el pedido con las salidas guardadas en golden/.')
+    ap.add_argument('cases', nargs='*', help='nombres de caso (por defecto todos)')
+    ap.add_argument('--update', action='store_true', help='reescribir los ficheros esperados')
+    ap.add_argument('--db', action='store_true', help='calcular desde la base SQLite local')
+    ap.add_argument('--atol', type=float, default=1e-9)
+    ap.add_argument('--rtol', type=float, default=1e-9)
+    args = ap.parse_args(argv)
+
+    cases = load_cases()
+    if args.cases:
+        unknown = set(args.cases) - {c['name'] for c in cases}
+        if unknown:
+            print(f"Casos desconocidos: {', '.join(sorted(unknown))}", file=sys.stderr)
+            return 2
+        cases = [c for c in cases if c['name'] in args.cases]
+
+    failed = 0
+    for case in cases:
+        if args.update:
+            names = update_case(case)
+            print(f"{case['name']}: actualizado ({', '.join(names) or 'sin tablas'})")
+            continue
+        problems = check_case(case, args.atol, args.rtol, args.db)
+        if problems:
+            failed += 1
+            print(f"{case['name']}: {len(problems)} diferencias")
+            for p in problems[:MAX_REPORTED]:
+                print(f'  {p}')
+            if len(problems) > MAX_REPORTED:
+                print(f'  ... y {len(problems) - MAX_REPORTED} más')
+        else:
+            print(f"{case['name']}: OK")
+    if not args.update:
+        print(f'{len(cases) - failed}/{len(cases)} casos iguales a golden/expected')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
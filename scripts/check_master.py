@@ -0,0 +1,163 @@
+"""Comprueba que scripts.master da lo mismo que el recorrido fila a fila anterior.
+
+Compara `merge_split_rows` y `units_per_pack` con las versiones originales (copiadas aquí) en los
+XLS de congelado/fresco/seco y en hojas aleatorias con filas partidas, huecos, 'nan'/'None' y
+nombres vacíos.
+
+Uso: python scripts/check_master.py [--cases 2000]
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from scripts.master import (  # noqa: E402
+    CODE_CANDIDATES, MASTER_FIELDS, MEASURE_CANDIDATES, NAME_CANDIDATES, PACK_CANDIDATES, UNITS_CANDIDATES,
+    detect_header_row, find_col, merge_split_rows, parse_order_sheet, read_order_sheet, units_per_pack,
+)
+
+
+def legacy_merge(df, name_col, code_col, units_col, measure_col, pack_col):
+    out = []
+    i = 0
+    n = len(df)
+    while i < n:
+        row = df.iloc[i]
+        name_val = row.get(name_col) if name_col is not None else None
+        code_val = row.get(code_col) if code_col is not None else None
+        units_val = row.get(units_col) if units_col is not None else None
+        measure_val = row.get(measure_col) if measure_col is not None else None
+        pack_val = row.get(pack_col) if pack_col is not None else None
+        merged = False
+        if (pd.isna(code_val) or code_val == '' or str(code_val).strip().lower() in ('nan', 'none')) and name_val and (i + 1) < n:
+            row2 = df.iloc[i + 1]
+            code2 = row2.get(code_col) if code_col is not None else None
+            units2 = row2.get(units_col) if units_col is not None else None
+            measure2 = row2.get(measure_col) if measure_col is not None else None
+            pack2 = row2.get(pack_col) if pack_col is not None else None
+            if (pd.notna(code2) and str(code2).strip() not in ('', 'nan', 'None')) or (pd.notna(units2) and str(units2).strip() not in ('', 'nan', 'None')):
+                out.append(dict(zip(MASTER_FIELDS, (name_val, code2, units2, measure2, pack2))))
+                merged = True
+        if not merged:
+            out.append(dict(zip(MASTER_FIELDS, (name_val, code_val, units_val, measure_val, pack_val))))
+        i += 2 if merged else 1
+    return out
+
+
+def legacy_upack(df):
+    def compute_upack(row):
+        try:
+            u = float(row['Unidades totales'])
+            e = float(row['Embalaje'])
+            if pd.isna(u) or pd.isna(e) or e == 0:
+                return None
+            val = u / e
+            if abs(val - round(val)) < 1e-8:
+                return int(round(val))
+            return round(val, 4)
+        except Exception:
+            return None
+    return df.apply(compute_upack, axis=1)
+
+
+def _same_value(a, b):
+    if a is None or b is None:
+        return a is b
+    try:
+        if pd.isna(a) and pd.isna(b):
+            return True
+    except (TypeError, ValueError):
+        pass
+    # np.float64 frente a float da igual: el DataFrame del maestro queda con los mismos tipos
+    numeric = (int, float, np.integer, np.floating)
+    if isinstance(a, numeric) and isinstance(b, numeric) and not isinstance(a, bool) and not isinstance(b, bool):
+        return isinstance(a, (int, np.integer)) == isinstance(b, (int, np.integer)) and a == b
+    return type(a) is type(b) and a == b
+
+
+def same_rows(a, b):
+    if len(a) != len(b):
+        return False
+    if a and not pd.DataFrame(a).dtypes.equals(pd.DataFrame(b).dtypes):
+        return False
+    return all(_same_value(ra[k], rb[k]) for ra, rb in zip(a, b) for k in MASTER_FIELDS)
+
+
+def same_upack(a, b):
+    return a.dtype == b.dtype and a.index.equals(b.index) and all(_same_value(x, y) for x, y in zip(a.tolist(), b.tolist()))
+
+
+def random_sheet(rng: random.Random):
+    n = rng.randint(0, 30)
+    pool_name = ['', 'Producto A', 'Producto B', np.nan, 0, 'x']
+    pool_code = [np.nan, '', ' ', 'nan', 'None', 'NONE', 1234, 'AB12', 0, ' 77 ']
+    pool_units = [np.nan, '', 'nan', 12, 7.5, '3,5', 0, 'None']
+    cols = {
+        'Articulo': [rng.choice(pool_name) for _ in range(n)],
+        'Codigo': [rng.choice(pool_code) for _ in range(n)],
+        'Unid. Totales': [rng.choice(pool_units) for _ in range(n)],
+        'Medida': [rng.choice(['KG', 'UN', np.nan]) for _ in range(n)],
+        'Embalaje': [rng.choice([np.nan, 6, 4, 0, '2,5']) for _ in range(n)],
+    }
+    df = pd.DataFrame(cols, index=range(3, 3 + n))
+    names = [None if rng.random() < 0.1 else c for c in cols]
+    return df, names
+
+
+def _numeric(df):
+    out = pd.DataFrame(df)
+    for c in ('Unidades totales', 'Embalaje'):
+        out[c] = pd.to_numeric(out[c].astype(str).str.replace(',', '.'), errors='coerce')
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--cases', type=int, default=2000)
+    args = ap.parse_args()
+    failures = 0
+
+    for folder in ('congelado', 'fresco', 'seco'):
+        for f in sorted(list(Path(folder).glob('*.xls')) + list(Path(folder).glob('*.xlsx'))):
+            raw = read_order_sheet(f)
+            t0 = time.perf_counter()
+            new = parse_order_sheet(raw)
+            t_new = time.perf_counter() - t0
+            hr = detect_header_row(raw)
+            df = raw.iloc[hr + 1:].copy()
+            df.columns = [str(c).strip() for c in raw.iloc[hr].astype(str).tolist()]
+            t0 = time.perf_counter()
+            old = legacy_merge(df, *(find_col(df.columns, c) for c in (NAME_CANDIDATES, CODE_CANDIDATES, UNITS_CANDIDATES, MEASURE_CANDIDATES, PACK_CANDIDATES)))
+            t_old = time.perf_counter() - t0
+            ok = same_rows(old, new)
+            frame = _numeric(pd.DataFrame(new)) if new else pd.DataFrame(columns=MASTER_FIELDS)
+            ok_u = same_upack(legacy_upack(frame), units_per_pack(frame['Unidades totales'], frame['Embalaje'])) if len(frame) else True
+            failures += (not ok) + (not ok_u)
+            print(f'{f}: {len(new)} filas, merge {"OK" if ok else "DIFF"}, upack {"OK" if ok_u else "DIFF"} '
+                  f'({t_old * 1000:.1f} ms -> {t_new * 1000:.1f} ms)')
+
+    rng = random.Random(0)
+    for case in range(args.cases):
+        df, names = random_sheet(rng)
+        old = legacy_merge(df, *names)
+        new = merge_split_rows(df, *names)
+        if not same_rows(old, new):
+            failures += 1
+            print('DIFF merge', case)
+            continue
+        frame = _numeric(pd.DataFrame(new, columns=MASTER_FIELDS))
+        if not same_upack(legacy_upack(frame), units_per_pack(frame['Unidades totales'], frame['Embalaje'])):
+            failures += 1
+            print('DIFF upack', case)
+    print(f'{args.cases} hojas aleatorias, {failures} diferencias')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
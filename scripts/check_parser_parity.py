@@ -0,0 +1,74 @@
+"""Comprueba que el motor vectorizado `parse_products_frame` da la misma salida que el
+recorrido por filas de `parse_products` (referencia).
+
+Uso: python scripts/check_parser_parity.py [fichero.xls ...]
+
+Sin argumentos prueba hojas sintéticas y todos los XLS/XLSX de las carpetas del proyecto.
+"""
+import sys
+import random
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+base = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(base))
+from scripts.parser import (UNIT_WORDS, _read_excel_fallback, _products_to_frame, _clean_products,
+                            parse_products, parse_products_frame)
+
+
+def synthetic_sheet(seed: int, nrows: int = 300, ncols: int = 18) -> pd.DataFrame:
+    rng = random.Random(seed)
+    cells = [np.nan, None, '', '   ', "'", '*', 'nan', 'Kilogramo', 'KILOGRAMO', 'gramos', 'Unidades',
+             'Bola', 'Litro\n', 'Fecha de grabación: 01/02/2026 10:00:00', 1.5, 2, 0.0, '1.305,00', '12,5',
+             '3.25', 'abc', "'ABC'", 'AB CD', 'ab1', '12', 12, 12.0]
+    codes = ['AB', 'BF', "'PSPR1'", ' EQ ', 'HAR\t', 'ab', 'A-1', 'A_1', '123', 123, 4.0, None, np.nan, '', 'X Y']
+    articles = ['MOZZARELLA', '** MASA', "'SALSA'", '', np.nan, '  PEPSI   1L ', 'ZZ OLD', None]
+    rows = []
+    for _ in range(nrows):
+        row = [rng.choice(cells) for _ in range(ncols)]
+        if rng.random() < 0.7:
+            row[0] = rng.choice(codes)
+            if ncols > 2:
+                row[2] = rng.choice(articles)
+            if rng.random() < 0.5:
+                row[rng.randrange(ncols)] = rng.choice(UNIT_WORDS)
+        rows.append(row)
+    return pd.DataFrame(rows, dtype=object)
+
+
+def check(df: pd.DataFrame, label: str) -> bool:
+    ref = _products_to_frame(parse_products(df))
+    vec = parse_products_frame(df)
+    try:
+        pd.testing.assert_frame_equal(ref.reset_index(drop=True), vec.reset_index(drop=True), check_dtype=False)
+        if not ref.empty:
+            pd.testing.assert_frame_equal(_clean_products(ref.copy()), _clean_products(vec.copy()))
+    except AssertionError as e:
+        print(f'FAIL {label}: {e}')
+        return False
+    print(f'OK   {label}: {len(ref)} filas')
+    return True
+
+
+if __name__ == '__main__':
+    ok = True
+    if len(sys.argv) > 1:
+        files = [Path(a) for a in sys.argv[1:]]
+    else:
+        files = []
+        for fld in ('ficheros_a_convertir', 'ficheros_a_convertir_bulk', 'congelado', 'fresco', 'seco'):
+            p = base / fld
+            files += sorted(p.glob('*.xls')) + sorted(p.glob('*.xlsx'))
+        if (base / 'inventario_actual.xls').exists():
+            files.append(base / 'inventario_actual.xls')
+        for seed in range(20):
+            ok &= check(synthetic_sheet(seed, ncols=random.Random(seed).choice([1, 2, 3, 5, 12, 18])), f'sintética {seed}')
+    for f in files:
+        try:
+            ok &= check(_read_excel_fallback(f), f.name)
+        except Exception as e:
+            print(f'ERROR {f.name}: {e}')
+            ok = False
+    sys.exit(0 if ok else 1)
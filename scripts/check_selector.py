@@ -0,0 +1,69 @@
+"""Comprueba los dos motores de `scripts.selector` (enumeración NumPy para pocos candidatos y DP)
+contra la búsqueda exhaustiva de 2^n máscaras que usaba "Calcular Pedido" (primero distancia en
+jueves, luego diferencia de ventas y, en empate, la primera máscara) y mide el tiempo con muchos
+candidatos.
+
+Uso: python scripts/check_selector.py [n_casos]
+"""
+import sys
+import time
+import random
+from pathlib import Path
+
+base = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(base))
+from scripts.selector import select_subset, _select_small, _select_dp
+
+
+def brute_force(values, th_counts, target, required_th):
+    best = None
+    for mask in range(1 << len(values)):
+        idxs = [i for i in range(len(values)) if mask >> i & 1]
+        s = sum(values[i] for i in idxs)
+        th = sum(th_counts[i] for i in idxs)
+        metric = (abs(required_th - th), abs(s - target))
+        if best is None or metric < best[0]:
+            best = (metric, idxs, th)
+    return best[1], best[2]
+
+
+def random_case(rng):
+    n = rng.randint(0, 12)
+    scale = rng.choice([5, 100, 300000])
+    values = [rng.randint(0, scale) for _ in range(n)]
+    if rng.random() < 0.3 and n:
+        # valores repetidos (ficheros de jueves duplicados) y ceros
+        values = [rng.choice(values + [0]) for _ in range(n)]
+    if rng.random() < 0.05 and n:
+        values[rng.randrange(n)] = -rng.randint(1, scale)
+    th_counts = [rng.choice([0, 0, 0, 1, 1, 2, 3]) for _ in range(n)]
+    target = rng.randint(-scale // 10, scale * max(1, n) // 2)
+    required_th = rng.randint(0, 4)
+    return values, th_counts, target, required_th
+
+
+if __name__ == '__main__':
+    cases = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    rng = random.Random(0)
+    fails = 0
+    for k in range(cases):
+        args = random_case(rng)
+        expected = brute_force(*args)
+        got = [fn(*args) for fn in (_select_small, _select_dp)]
+        if any(g != expected for g in got):
+            fails += 1
+            if fails <= 5:
+                print('FAIL', args, got, expected)
+    print(f'{cases - fails}/{cases} casos iguales a la búsqueda exhaustiva')
+
+    # escala: 60+ ficheros con ventas diarias realistas (en céntimos)
+    for n in (20, 40, 64):
+        values = [rng.randint(150000, 450000) * (rng.choice([1, 1, 1, 7])) for _ in range(n)]
+        th_counts = [1 if v > 450000 else rng.choice([0, 0, 0, 0, 0, 0, 1]) for v in values]
+        target = sum(values) // 5
+        t0 = time.perf_counter()
+        idxs, th = select_subset(values, th_counts, target, 2)
+        dt = time.perf_counter() - t0
+        diff = abs(sum(values[i] for i in idxs) - target)
+        print(f'n={n}: {dt:.3f}s, jueves={th}, diferencia={diff} céntimos')
+    sys.exit(1 if fails else 0)
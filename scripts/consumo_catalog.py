@@ -0,0 +1,165 @@
+"""Catálogo por fechas de los ficheros de consumo_teorico.
+
+Cada CSV con fecha en el nombre (DD-MM-YY.csv o DD-MM-YY_DD-MM-YY.csv) es una entrada con su
+inicio, fin, número de días, jueves y reparto por día de la semana, calculados una vez a partir
+del nombre. Las entradas se guardan ordenadas por inicio en arrays de ordinales de fecha junto
+con el máximo acumulado del fin: "qué ficheros cubren estas fechas" es una búsqueda binaria más
+los ficheros que solapan (no se recorre ningún rango día a día) y los jueves de un conjunto de
+ficheros salen de sumar su columna.
+
+`load_catalog(folder)` mantiene el catálogo en memoria por carpeta; al volver a llamarlo solo se
+analizan los nombres nuevos y se quitan los borrados (como las cachés de `scripts.consumo_cube`).
+"""
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime
+from pathlib import Path
+
+import numpy as np
+
+from scripts.consumo_store import is_sidecar
+
+
+THURSDAY = 3
+
+_CACHE = {}
+
+
+def parse_fname_dates(p):
+    """Fecha (DD-MM-YY) o rango (DD-MM-YY_DD-MM-YY) del nombre del fichero; None si no tiene.
+    Acepta una ruta o solo el nombre."""
+    stem = Path(p).stem
+    if '_' in stem:
+        parts = stem.split('_')
+        if len(parts) >= 2:
+            try:
+                start = datetime.strptime(parts[0], '%d-%m-%y').date()
+                end = datetime.strptime(parts[1], '%d-%m-%y').date()
+                return (start, end)
+            except Exception:
+                return None
+    try:
+        return datetime.strptime(stem, '%d-%m-%y').date()
+    except Exception:
+        return None
+
+
+def weekday_histogram(start: date, end: date):
+    """Número de lunes..domingos en [start, end] (tupla de 7)."""
+    days = (end - start).days + 1
+    if days <= 0:
+        return (0,) * 7
+    weeks, rest = divmod(days, 7)
+    counts = [weeks] * 7
+    for k in range(rest):
+        counts[(start.weekday() + k) % 7] += 1
+    return tuple(counts)
+
+
+def make_entry(p):
+    """Entrada del catálogo para el fichero `p` (ruta o nombre); None si el nombre no tiene fecha.
+    'rango' distingue DD-MM-YY_DD-MM-YY de un día suelto (el pedido los trata distinto)."""
+    parsed = parse_fname_dates(p)
+    if parsed is None:
+        return None
+    start, end = parsed if isinstance(parsed, tuple) else (parsed, parsed)
+    week = weekday_histogram(start, end)
+    return {
+        'fichero': Path(p).name,
+        'inicio': start,
+        'fin': end,
+        'rango': isinstance(parsed, tuple),
+        'dias': max(0, (end - start).days + 1),
+        'jueves': week[THURSDAY],
+        'semana': week,
+    }
+
+
+def build_catalog(entries):
+    """Catálogo (dict) a partir de las entradas: ordenadas por (inicio, nombre) con sus arrays."""
+    entries = sorted((e for e in entries if e is not None), key=lambda e: (e['inicio'], e['fichero']))
+    ends = np.array([e['fin'].toordinal() for e in entries], dtype=np.int64)
+    return {
+        'entries': entries,
+        'index': {e['fichero']: i for i, e in enumerate(entries)},
+        'starts': [e['inicio'].toordinal() for e in entries],
+        'ends': ends,
+        # máximo acumulado del fin: no decrece, así que se puede buscar con searchsorted
+        'max_end': np.maximum.accumulate(ends) if len(ends) else ends,
+        'jueves': np.array([e['jueves'] for e in entries], dtype=np.int64),
+        'semana': np.array([e['semana'] for e in entries], dtype=np.int64).reshape(-1, 7),
+    }
+
+
+def _listing(folder: Path):
+    if not folder.exists():
+        return []
+    return [f.name for f in folder.glob('*.csv') if not is_sidecar(f)]
+
+
+def load_catalog(folder: Path):
+    """Catálogo de los CSV de `folder`. Se reutiliza entre llamadas: solo se analizan los nombres
+    que no estaban y se quitan los que ya no existen."""
+    folder = Path(folder)
+    key = str(folder.resolve())
+    names = frozenset(_listing(folder))
+    hit = _CACHE.get(key)
+    if hit is not None and hit['names'] == names:
+        return hit['catalog']
+    known = dict(hit['entries']) if hit is not None else {}
+    for name in set(known) - names:
+        del known[name]
+    for name in names - set(known):
+        known[name] = make_entry(name)
+    catalog = build_catalog(known.values())
+    _CACHE[key] = {'names': names, 'entries': known, 'catalog': catalog}
+    return catalog
+
+
+def _span(catalog, start: date, end: date):
+    """Posiciones de los ficheros que se solapan con [start, end]."""
+    hi = bisect_right(catalog['starts'], end.toordinal())
+    lo = int(np.searchsorted(catalog['max_end'][:hi], start.toordinal(), side='left'))
+    return lo + np.flatnonzero(catalog['ends'][lo:hi] >= start.toordinal())
+
+
+def files_covering(catalog, start: date, end: date = None):
+    """Nombres (ordenados por inicio) de los ficheros que cubren algún día de [start, end]
+    (solo `start` si no se da `end`)."""
+    end = start if end is None else end
+    if end < start:
+        return []
+    return [catalog['entries'][i]['fichero'] for i in _span(catalog, start, end)]
+
+
+def files_within(catalog, start: date, end: date):
+    """Nombres de los ficheros cuyo rango cae entero dentro de [start, end]."""
+    lo = bisect_left(catalog['starts'], start.toordinal())
+    hi = bisect_right(catalog['starts'], end.toordinal())
+    return [catalog['entries'][lo + i]['fichero'] for i in np.flatnonzero(catalog['ends'][lo:hi] <= end.toordinal())]
+
+
+def entry(catalog, name):
+    """Entrada del fichero `name` (si no está en el catálogo se calcula a partir del nombre)."""
+    i = catalog['index'].get(Path(name).name) if catalog is not None else None
+    return catalog['entries'][i] if i is not None else make_entry(name)
+
+
+def count_thursdays(names, catalog=None):
+    """Jueves que suman los ficheros `names` (contando repeticiones); los nombres sin fecha, 0."""
+    total = 0
+    for name in names:
+        e = entry(catalog, name)
+        total += e['jueves'] if e is not None else 0
+    return total
+
+
+def weekday_counts(catalog, names=None):
+    """Lunes..domingos que suman los ficheros `names` (todos los del catálogo si es None)."""
+    if names is None:
+        return tuple(int(x) for x in catalog['semana'].sum(axis=0)) if len(catalog['entries']) else (0,) * 7
+    counts = [0] * 7
+    for name in names:
+        e = entry(catalog, name)
+        if e is not None:
+            counts = [a + b for a, b in zip(counts, e['semana'])]
+    return tuple(counts)
@@ -0,0 +1,108 @@
+"""Cubo de consumos en memoria: una fila por fichero de `consumo_teorico` y una columna por producto.
+
+Al pulsar "Calcular Pedido" se agregaban los CSV elegidos con `pd.concat(...).groupby(...)` y,
+para los días extra de masas/topping, se releía la carpeta entera producto a producto. El cubo se
+construye una vez (a partir de las copias tipadas de `scripts.consumo_store`) y se guarda a nivel
+de módulo, así que sobrevive a los reruns de Streamlit; se rehace cuando cambia la carpeta
+(mtime) o algún CSV (tamaño/mtime).
+
+Estructura (dict):
+- 'files': nombres de los CSV (filas), 'row': nombre -> fila, 'valid': filas con columna de consumo
+- 'keys': DataFrame Codigo/Articulo/Unidad_de_Medida (columnas), ordenado como lo deja `groupby`
+- 'matrix': consumo por fichero y clave; 'present': la clave aparece en el fichero
+"""
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from scripts.consumo_store import KEY_COLS, read_consumo
+
+
+_CACHE = {}
+
+
+def _folder_signature(folder: Path):
+    files = sorted(folder.glob('*.csv'))
+    sig = [folder.stat().st_mtime_ns]
+    for f in files:
+        st = f.stat()
+        sig.append((f.name, st.st_size, st.st_mtime_ns))
+    return files, tuple(sig)
+
+
+def build_cube(names, tables):
+    """Cubo a partir de los nombres de fichero y sus tablas tipadas (None si el fichero no tiene
+    columna de consumo), en el orden de `names`."""
+    nfiles = len(names)
+    frames = []
+    valid = np.zeros(nfiles, dtype=bool)
+    for i, df in enumerate(tables):
+        if df is None:
+            continue
+        valid[i] = True
+        frames.append(df.assign(_fila=i))
+    if frames:
+        data = pd.concat(frames, ignore_index=True)
+    else:
+        data = pd.DataFrame(columns=KEY_COLS + ['Consumo', '_fila'])
+    rows = data['_fila'].to_numpy(dtype=np.intp)
+    cons = data['Consumo'].to_numpy(dtype=float)
+
+    # claves Codigo/Articulo/Unidad: mismas exclusiones (NaN) y orden que groupby(...)
+    key_ids = data.groupby(KEY_COLS, sort=True).ngroup().fillna(-1).to_numpy(dtype=np.intp)
+    keys = data.groupby(KEY_COLS, as_index=False)['Consumo'].sum()[KEY_COLS]
+    keep = key_ids >= 0
+    matrix = np.zeros((nfiles, len(keys)))
+    present = np.zeros((nfiles, len(keys)), dtype=bool)
+    np.add.at(matrix, (rows[keep], key_ids[keep]), cons[keep])
+    present[rows[keep], key_ids[keep]] = True
+
+    return {
+        'files': list(names),
+        'row': {name: i for i, name in enumerate(names)},
+        'valid': valid,
+        'keys': keys,
+        'matrix': matrix,
+        'present': present,
+    }
+
+
+def _build(files):
+    return build_cube([f.name for f in files], [read_consumo(f) for f in files])
+
+
+def load_cube(folder: Path):
+    """Cubo de `folder` (se reutiliza mientras no cambien la carpeta ni sus CSV)."""
+    folder = Path(folder)
+    files, sig = _folder_signature(folder)
+    key = str(folder.resolve())
+    hit = _CACHE.get(key)
+    if hit is not None and hit[0] == sig:
+        return hit[1]
+    cube = _build(files)
+    _CACHE[key] = (sig, cube)
+    return cube
+
+
+def _selection(cube, paths):
+    """Vector de selección (veces que aparece cada fichero en `paths`, solo los legibles)."""
+    sel = np.zeros(len(cube['files']))
+    for p in paths:
+        i = cube['row'].get(Path(p).name)
+        if i is not None and cube['valid'][i]:
+            sel[i] += 1
+    return sel
+
+
+def aggregate(cube, paths):
+    """Equivalente a concatenar los CSV de `paths` y hacer
+    groupby(['Codigo', 'Articulo', 'Unidad_de_Medida'], as_index=False)['Consumo'].sum().
+    Devuelve None si ninguno de los ficheros tiene columna de consumo."""
+    sel = _selection(cube, paths)
+    if not sel.any():
+        return None
+    used = (sel @ cube['present']) > 0
+    agg = cube['keys'].loc[used].reset_index(drop=True)
+    agg['Consumo'] = (sel @ cube['matrix'])[used]
+    return agg
@@ -0,0 +1,135 @@
+"""Copias tipadas (Parquet) de los CSV de consumo e inventario.
+
+Los CSV generados guardan los números como texto ('1.305,00', '12,5') y cada lectura tenía que
+volver a convertirlos con `.str.replace(',', '.')` + `pd.to_numeric`. Al convertir se guarda, junto
+a cada CSV, un `.parquet` con la tabla ya tipada (Consumo/Real en float64, columnas clave con el
+tipo que infiere `read_csv`) y los lectores cargan esa copia directamente.
+
+El CSV sigue siendo la fuente de verdad: cada copia guarda en sus metadatos la firma (tamaño y
+fecha de modificación) del CSV del que salió, y si falta, la firma no coincide (el CSV se
+sustituyó, aunque sea por uno con fecha más antigua) o pyarrow no está instalado, se lee el CSV
+con la misma normalización. Los lectores (`read_consumo`, `read_inventory`) regeneran la copia
+en ese caso: leer una carpeta puede escribir `.parquet` en ella.
+"""
+import json
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PARQUET_AVAILABLE = True
+except Exception:
+    PARQUET_AVAILABLE = False
+
+
+KEY_COLS = ['Codigo', 'Articulo', 'Unidad_de_Medida']
+SIDECAR_SUFFIX = '.parquet'
+# clave de los metadatos del .parquet con la firma del CSV de origen
+SIGNATURE_KEY = b'pedido_csv_firma'
+
+
+def sidecar_path(csv_path: Path) -> Path:
+    return Path(csv_path).with_suffix(SIDECAR_SUFFIX)
+
+
+def is_sidecar(path: Path) -> bool:
+    return Path(path).suffix.lower() == SIDECAR_SUFFIX
+
+
+def _read_csv(path: Path):
+    try:
+        return pd.read_csv(path, encoding='utf-8')
+    except Exception:
+        return pd.read_csv(path, encoding='latin-1')
+
+
+def _to_number(col):
+    return pd.to_numeric(col.astype(str).str.replace(',', '.'), errors='coerce').fillna(0)
+
+
+def _typed_consumo(df: pd.DataFrame):
+    """Codigo/Articulo/Unidad_de_Medida/Consumo con Consumo numérico (o None si no hay columna)."""
+    if 'Consumo' in df.columns:
+        cons_col = 'Consumo'
+    else:
+        cands = [c for c in df.columns if c not in KEY_COLS]
+        cons_col = cands[-1] if cands else None
+    if cons_col is None:
+        return None
+    out = df[KEY_COLS + [cons_col]].rename(columns={cons_col: 'Consumo'})
+    out['Consumo'] = _to_number(out['Consumo'])
+    return out
+
+
+def _typed_inventory(df: pd.DataFrame):
+    """Inventario con la columna Real numérica (0 si no existe)."""
+    if 'Real' in df.columns:
+        df['Real'] = _to_number(df['Real'])
+    else:
+        df['Real'] = 0.0
+    return df
+
+
+TYPERS = {'consumo': _typed_consumo, 'inventario': _typed_inventory}
+
+
+def _csv_signature(csv_path: Path):
+    st = Path(csv_path).stat()
+    return json.dumps([st.st_size, st.st_mtime_ns]).encode()
+
+
+def _fresh_sidecar(csv_path: Path):
+    """La copia de `csv_path` si se hizo a partir del CSV tal y como está ahora (misma firma)."""
+    side = sidecar_path(csv_path)
+    try:
+        metadata = pq.read_schema(side).metadata or {}
+        return side if metadata.get(SIGNATURE_KEY) == _csv_signature(csv_path) else None
+    except Exception:
+        return None
+
+
+def write_sidecar(csv_path: Path, kind: str = 'consumo'):
+    """Crea (o rehace) la copia tipada de `csv_path` leyendo el CSV tal y como lo leen los
+    cálculos. Devuelve la tabla tipada (o None si el CSV no tiene columna de valores)."""
+    csv_path = Path(csv_path)
+    # firma tomada antes de leer: si el CSV cambia mientras tanto, la copia no valdrá
+    signature = _csv_signature(csv_path)
+    typed = TYPERS[kind](_read_csv(csv_path))
+    if typed is not None and PARQUET_AVAILABLE:
+        side = sidecar_path(csv_path)
+        tmp = side.with_name(side.name + '.tmp')
+        try:
+            table = pa.Table.from_pandas(typed, preserve_index=False)
+            table = table.replace_schema_metadata({**(table.schema.metadata or {}), SIGNATURE_KEY: signature})
+            pq.write_table(table, tmp)
+            tmp.replace(side)
+        except Exception:
+            # sin copia tipada se seguirá leyendo el CSV
+            try:
+                tmp.unlink()
+            except OSError:
+                pass
+    return typed
+
+
+def read_typed(csv_path: Path, kind: str = 'consumo'):
+    """Tabla tipada de `csv_path`: desde el `.parquet` si está al día, si no desde el CSV (y se
+    rehace el `.parquet`)."""
+    if PARQUET_AVAILABLE:
+        side = _fresh_sidecar(csv_path)
+        if side is not None:
+            try:
+                return pd.read_parquet(side)
+            except Exception:
+                pass
+    return write_sidecar(csv_path, kind)
+
+
+def read_consumo(csv_path: Path):
+    return read_typed(csv_path, 'consumo')
+
+
+def read_inventory(csv_path: Path):
+    return read_typed(csv_path, 'inventario')
@@ -0,0 +1,78 @@
+"""Manifiesto persistente de conversiones XLS -> CSV.
+
+Cada entrada se indexa por el SHA-256 del contenido del fichero origen, el tipo de conversión
+(consumo, bulk, inventario) y `PARSER_VERSION`, y guarda los CSV que produjo. Si el mismo
+contenido vuelve a llegar (reruns de Streamlit con el fichero aún en el cargador) y sus CSV
+siguen existiendo, no hace falta escribirlo ni volver a parsearlo.
+"""
+import json
+import hashlib
+from pathlib import Path
+
+from scripts.parser import PARSER_VERSION
+
+
+MANIFEST_PATH = Path('conversion_manifest.json')
+
+
+def content_key(data: bytes, kind: str) -> str:
+    digest = hashlib.sha256(data).hexdigest()
+    return f'{digest}:{kind}:v{PARSER_VERSION}'
+
+
+def file_key(path: Path, kind: str) -> str:
+    return content_key(Path(path).read_bytes(), kind)
+
+
+def load_manifest(path: Path = MANIFEST_PATH) -> dict:
+    try:
+        with open(path, 'r', encoding='utf-8') as fh:
+            data = json.load(fh)
+        return data if isinstance(data, dict) else {}
+    except Exception:
+        return {}
+
+
+def save_manifest(manifest: dict, path: Path = MANIFEST_PATH):
+    path = Path(path)
+    tmp = path.with_name(path.name + '.tmp')
+    with open(tmp, 'w', encoding='utf-8') as fh:
+        json.dump(manifest, fh, ensure_ascii=False, indent=1)
+    tmp.replace(path)
+
+
+def _signature(path: Path):
+    st = Path(path).stat()
+    return [st.st_size, st.st_mtime_ns]
+
+
+def cached_outputs(manifest: dict, key: str):
+    """Lista de CSV generados para `key`, o None si no está o alguno ya no existe o ha cambiado
+    desde la conversión (p. ej. lo sobrescribió otro fichero con la misma fecha)."""
+    entry = manifest.get(key)
+    if not entry:
+        return None
+    outputs = entry.get('outputs') or []
+    if not outputs:
+        return None
+    try:
+        if any(_signature(o['path']) != o['signature'] for o in outputs):
+            return None
+    except Exception:
+        return None
+    return [o['path'] for o in outputs]
+
+
+def recorded_outputs(manifest: dict, key: str):
+    """CSV que produjo `key` la última vez que se convirtió (existan o no, hayan cambiado o no)."""
+    entry = manifest.get(key) or {}
+    return [o['path'] for o in entry.get('outputs') or [] if 'path' in o]
+
+
+def record_conversion(manifest: dict, key: str, source: str, outputs, shadowed=False):
+    """Apunta los CSV que produjo `key`. Con `shadowed` (el CSV lo escribió otro fichero posterior)
+    se guardan sin firma: nunca se sirven desde la caché, pero se sabe qué CSV genera."""
+    manifest[key] = {
+        'source': source,
+        'outputs': [{'path': str(o), 'signature': None if shadowed else _signature(o)} for o in outputs],
+    }
@@ -0,0 +1,181 @@
+"""Conversión de ficheros XLS/XLSX de consumo a CSV en `consumo_teorico`.
+
+Funciones sin dependencia de Streamlit para poder ejecutarlas en procesos hijos
+(`ProcessPoolExecutor`). La app las usa para los cargadores de la barra lateral.
+"""
+from pathlib import Path
+from datetime import timedelta
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from scripts.parser import read_xls, extract_all_dates
+from scripts.conversion_cache import file_key, load_manifest, save_manifest, cached_outputs, record_conversion, recorded_outputs
+from scripts.consumo_store import sidecar_path, write_sidecar
+
+
+CONS_COL_CANDIDATES = ['Col_10', 'Col_9', 'Col_11', 'Col_8', 'Col_12']
+
+
+def select_consumo(table):
+    """Devuelve la tabla Codigo/Articulo/Unidad_de_Medida/Consumo o None si no hay columna de consumo."""
+    cons_col = None
+    for cand in CONS_COL_CANDIDATES:
+        if cand in table.columns:
+            cons_col = cand
+            break
+    if cons_col is None:
+        for coln in table.columns:
+            if coln not in ('Codigo', 'Articulo', 'Unidad_de_Medida'):
+                cons_col = coln
+                break
+    if cons_col is None:
+        return None
+    return table[['Codigo', 'Articulo', 'Unidad_de_Medida', cons_col]].rename(columns={cons_col: 'Consumo'})
+
+
+def second_thursday_from(d):
+    delta = (3 - d.weekday()) % 7
+    first = d + timedelta(days=delta)
+    second = first + timedelta(days=7)
+    return second
+
+
+def bulk_fname(date, all_dates):
+    """Nombre DD-MM-YY_DD-MM-YY.csv de un fichero bulk: primera y segunda fecha de grabación
+    (menos un día) o, si solo hay una, la fecha interna hasta el segundo jueves."""
+    if len(all_dates) >= 2:
+        base_dt = all_dates[0]
+        end_dt = all_dates[1] - timedelta(days=1)
+        return f"{base_dt.strftime('%d-%m-%y')}_{end_dt.strftime('%d-%m-%y')}.csv"
+    return f"{date.strftime('%d-%m-%y')}_{second_thursday_from(date).strftime('%d-%m-%y')}.csv"
+
+
+def parse_consumo_file(path, bulk=False):
+    """Lee y transforma un fichero de consumo sin escribir nada en disco.
+
+    Devuelve (nombre_fichero, estado, detalle, nombre_csv, tabla). `nombre_csv` y `tabla`
+    solo están presentes si estado == 'SAVED'.
+    """
+    path = Path(path)
+    try:
+        raw_df, date, table = read_xls(path)
+    except Exception as e:
+        return (path.name, 'ERROR', str(e), None, None)
+    if date is None:
+        return (path.name, 'NO_DATE', 'No se encontró fecha interna', None, None)
+    if table is None or table.empty:
+        return (path.name, 'NO_PRODUCTS', 'No se extrajeron líneas de producto', None, None)
+    if bulk:
+        fname = bulk_fname(date, extract_all_dates(raw_df))
+    else:
+        fname = date.strftime('%d-%m-%y') + '.csv'
+    save_df = select_consumo(table)
+    if save_df is None:
+        return (path.name, 'NO_CONS_COL', 'No se localizó columna Consumo', None, None)
+    return (path.name, 'SAVED', fname, fname, save_df)
+
+
+def _parse_worker(path_str, bulk):
+    return parse_consumo_file(Path(path_str), bulk=bulk)
+
+
+def save_consumo(save_df, target: Path, kind='consumo'):
+    """Guarda el CSV y su copia tipada (.parquet) para que los cálculos no reparseen el texto."""
+    for p in (target, sidecar_path(target)):
+        if p.exists():
+            p.unlink()
+    save_df.to_csv(target, index=False, encoding='utf-8')
+    try:
+        write_sidecar(target, kind)
+    except Exception:
+        # la copia se regenera al leer
+        pass
+
+
+def convert_consumo_files(files, dst_dir: Path, bulk=False, workers=1, manifest_path=None):
+    """Convierte `files` a CSV en `dst_dir` y va devolviendo (nombre, estado, detalle) según terminan.
+
+    Con `workers` > 1 el parseo se reparte en un `ProcessPoolExecutor`; con 1 (o si no se puede
+    crear el pool) se procesa secuencialmente. La escritura se hace siempre en este proceso y,
+    si dos ficheros generan el mismo CSV, prevalece el último de `files`, igual que en secuencial.
+    Con `manifest_path`, los ficheros cuyo contenido ya se convirtió (y cuyo CSV sigue existiendo)
+    no se vuelven a parsear y se devuelven con estado 'CACHED'.
+    """
+    files = list(files)
+    dst_dir = Path(dst_dir)
+    dst_dir.mkdir(parents=True, exist_ok=True)
+    kind = 'bulk' if bulk else 'consumo'
+    manifest = load_manifest(manifest_path) if manifest_path is not None else None
+    keys = {}
+    written = {}
+
+    def _finish(idx, parsed):
+        name, status, detail, fname, save_df = parsed
+        if status != 'SAVED':
+            return (name, status, detail)
+        if written.get(fname, -1) > idx:
+            # ya se guardó el resultado de un fichero posterior con el mismo nombre
+            if manifest is not None and idx in keys:
+                record_conversion(manifest, keys[idx], name, [dst_dir / fname], shadowed=True)
+            return (name, status, detail)
+        try:
+            save_consumo(save_df, dst_dir / fname)
+            written[fname] = idx
+            if manifest is not None and idx in keys:
+                record_conversion(manifest, keys[idx], name, [dst_dir / fname])
+            return (name, status, detail)
+        except Exception as e:
+            return (name, 'ERROR_SAVE', str(e))
+
+    pending = []
+    cached = []
+    for idx, f in enumerate(files):
+        if manifest is not None:
+            try:
+                keys[idx] = file_key(f, kind)
+            except Exception:
+                pass
+            outputs = cached_outputs(manifest, keys[idx]) if idx in keys else None
+            if outputs:
+                # el CSV es de este fichero: uno anterior con la misma fecha no debe pisarlo
+                for o in outputs:
+                    written[Path(o).name] = max(written.get(Path(o).name, -1), idx)
+                cached.append((Path(f).name, 'CACHED', ', '.join(Path(o).name for o in outputs)))
+                continue
+        pending.append(idx)
+    if manifest is not None:
+        # ficheros cuya última conversión solo dio CSV que ahora son de uno posterior en caché:
+        # su resultado se descartaría igualmente, así que no se vuelven a parsear
+        for idx in list(pending):
+            previous = [Path(o).name for o in recorded_outputs(manifest, keys[idx])] if idx in keys else []
+            if previous and all(written.get(name, -1) > idx for name in previous):
+                pending.remove(idx)
+                owners = sorted({Path(files[written[name]]).name for name in previous})
+                cached.append((Path(files[idx]).name, 'CACHED', f"{', '.join(previous)} (prevalece {', '.join(owners)})"))
+    try:
+        for r in cached:
+            yield r
+        if workers and workers > 1 and len(pending) > 1:
+            try:
+                with ProcessPoolExecutor(max_workers=min(workers, len(pending))) as pool:
+                    futures = {pool.submit(_parse_worker, str(files[i]), bulk): i for i in pending}
+                    for fut in as_completed(futures):
+                        idx = futures[fut]
+                        try:
+                            parsed = fut.result()
+                        except Exception:
+                            # el proceso hijo murió; se reintenta en secuencial más abajo
+                            continue
+                        pending.remove(idx)
+                        yield _finish(idx, parsed)
+            except Exception:
+                # sin soporte de procesos (p. ej. entorno restringido): continuar en secuencial
+                pass
+        for idx in list(pending):
+            pending.remove(idx)
+            yield _finish(idx, parse_consumo_file(files[idx], bulk=bulk))
+    finally:
+        if manifest is not None:
+            try:
+                save_manifest(manifest, manifest_path)
+            except Exception:
+                pass
@@ -2,6 +2,7 @@ from pathlib import Path
 import pandas as pd
 from datetime import date, datetime
 from scripts.sales_utils import summarize_range, load_real_sales, load_estimated_sales
+from scripts.selector import select_subset
 
 base = Path('.')
 start = date(2026,2,1)
@@ -64,27 +65,8 @@ if not candidates_real:
 else:
     target = int(round(res['total'] * 100))
     vals = [int(round(v*100)) for (_f,_d,v) in candidates_real]
-    n = len(vals)
-    best_idxs = []
-    def subset_sums(items):
-        res = []
-        n = len(items)
-        for mask in range(1 << n):
-            s = 0
-            idxs = []
-            for i in range(n):
-                if mask >> i & 1:
-                    s += items[i]
-                    idxs.append(i)
-            res.append((s, idxs))
-        return res
-    if n <= 20:
-        subsets = subset_sums(vals)
-        best = min(subsets, key=lambda x: abs(x[0] - target))
-        best_idxs = best[1]
-    else:
-        # not expected
-        best_idxs = []
+    # sin restricción de jueves: solo la diferencia de ventas
+    best_idxs, _ = select_subset(vals, [0] * len(vals), target, 0)
     chosen = [candidates_real[i] for i in best_idxs]
     print('\nChosen files and associated real sales:')
     for f,d,v in chosen:
@@ -0,0 +1,365 @@
+"""Base de datos local (SQLite) con el histórico de consumo, ventas, inventario y maestro.
+
+Las carpetas siguen siendo el formato de entrada/salida (consumo_teorico/*.csv, venta.xlsx,
+venta_estimada/*.csv, inventario_actual/inventario_real.csv, congelado/fresco/seco); `sync` las
+importa a pedido.sqlite de forma incremental (solo los ficheros nuevos o cambiados, por tamaño y
+mtime, y borra los que ya no existen) con los mismos lectores que usa el cálculo, así que los
+valores guardados son exactamente los que se leerían de los ficheros.
+
+Tablas:
+- consumo_ficheros(fichero, inicio, fin, dias, jueves, valido): un registro por CSV, índice por rango
+- consumo(fichero, fila, codigo, articulo, unidad, consumo): índice por código
+- ventas(fecha, fuente, valor): fuente 'real' o 'estimada'
+- inventario_snapshots / inventario(snapshot, fila, codigo, articulo, unidad, real): una foto por
+  cada versión de inventario_real.csv importada (se guardan las `INVENTORY_SNAPSHOTS` últimas)
+- maestro(seccion, fila, nombre, codigo, unidades, medida, embalaje, origen)
+
+Las columnas de código/artículo/unidad no tienen tipo declarado: SQLite guarda cada valor con su
+tipo (un código numérico sigue siendo entero, '007' sigue siendo texto).
+
+Consultas por rango y código desde la línea de órdenes (sincroniza antes):
+    python -m scripts.local_db . --codigo BF --desde 2026-01-01 --hasta 2026-01-31
+    python -m scripts.local_db . --ventas --desde 2026-01-01 --hasta 2026-01-31
+"""
+import argparse
+import json
+import sqlite3
+import sys
+from contextlib import closing
+from datetime import date, datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from scripts.consumo_catalog import make_entry
+from scripts.consumo_cube import build_cube
+from scripts.consumo_store import KEY_COLS, is_sidecar, read_consumo, read_inventory
+from scripts.master import MASTER_FIELDS, load_items_from_folder
+from scripts.sales_utils import load_estimated_sales, load_real_sales
+
+
+DB_NAME = 'pedido.sqlite'
+MASTER_SECTIONS = ('congelado', 'fresco', 'seco')
+INVENTORY_SNAPSHOTS = 30
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS firmas (clave TEXT PRIMARY KEY, firma TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS consumo_ficheros (
+    fichero TEXT PRIMARY KEY, inicio TEXT, fin TEXT, dias INTEGER, jueves INTEGER, valido INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS consumo_ficheros_rango ON consumo_ficheros (inicio, fin);
+CREATE TABLE IF NOT EXISTS consumo (
+    fichero TEXT NOT NULL, fila INTEGER NOT NULL, codigo, articulo, unidad, consumo REAL,
+    PRIMARY KEY (fichero, fila));
+CREATE INDEX IF NOT EXISTS consumo_codigo ON consumo (codigo);
+CREATE TABLE IF NOT EXISTS ventas (fecha TEXT NOT NULL, fuente TEXT NOT NULL, valor REAL, PRIMARY KEY (fecha, fuente));
+CREATE TABLE IF NOT EXISTS inventario_snapshots (
+    snapshot INTEGER PRIMARY KEY AUTOINCREMENT, fichero TEXT, modificado TEXT, importado TEXT);
+CREATE TABLE IF NOT EXISTS inventario (
+    snapshot INTEGER NOT NULL, fila INTEGER NOT NULL, codigo, articulo, unidad, real REAL,
+    PRIMARY KEY (snapshot, fila));
+CREATE INDEX IF NOT EXISTS inventario_codigo ON inventario (codigo);
+CREATE TABLE IF NOT EXISTS maestro (
+    seccion TEXT NOT NULL, fila INTEGER NOT NULL, nombre, codigo, unidades, medida, embalaje, origen TEXT,
+    PRIMARY KEY (seccion, fila));
+CREATE INDEX IF NOT EXISTS maestro_codigo ON maestro (codigo);
+"""
+
+
+def db_path(base: Path) -> Path:
+    return Path(base) / DB_NAME
+
+
+def connect(path: Path):
+    """Conexión con el esquema creado. Cada llamada abre su propia conexión (los reruns de
+    Streamlit van en hilos distintos)."""
+    conn = sqlite3.connect(str(path), timeout=30)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _py(values):
+    """Valores de Python para SQLite (NaN -> NULL, escalares de NumPy -> int/float/str)."""
+    out = []
+    for v in values:
+        if v is None or (isinstance(v, float) and v != v):
+            out.append(None)
+        elif isinstance(v, np.generic):
+            v = v.item()
+            out.append(None if isinstance(v, float) and v != v else v)
+        else:
+            out.append(v)
+    return out
+
+
+def _na(values):
+    """NULL de SQLite -> NaN (como lo dejan los lectores de ficheros)."""
+    return [np.nan if v is None else v for v in values]
+
+
+def _column(df, col):
+    return _py(df[col].astype(object).tolist()) if col in df.columns else [None] * len(df)
+
+
+def _signature(paths):
+    sig = []
+    for p in paths:
+        try:
+            st = p.stat()
+        except OSError:
+            continue
+        sig.append([p.name, st.st_mtime_ns, st.st_size])
+    return json.dumps(sig)
+
+
+def _changed(conn, key, sig):
+    row = conn.execute('SELECT firma FROM firmas WHERE clave = ?', (key,)).fetchone()
+    return row is None or row[0] != sig
+
+
+def _set_signature(conn, key, sig):
+    conn.execute('INSERT OR REPLACE INTO firmas (clave, firma) VALUES (?, ?)', (key, sig))
+
+
+def _sync_consumo(conn, folder: Path):
+    files = sorted(f for f in folder.glob('*.csv') if not is_sidecar(f)) if folder.exists() else []
+    names = {f.name for f in files}
+    removed = [r[0] for r in conn.execute('SELECT fichero FROM consumo_ficheros') if r[0] not in names]
+    for name in removed:
+        conn.execute('DELETE FROM consumo WHERE fichero = ?', (name,))
+        conn.execute('DELETE FROM consumo_ficheros WHERE fichero = ?', (name,))
+        conn.execute('DELETE FROM firmas WHERE clave = ?', (f'consumo/{name}',))
+    imported = 0
+    for f in files:
+        key, sig = f'consumo/{f.name}', _signature([f])
+        if not _changed(conn, key, sig):
+            continue
+        df = read_consumo(f)
+        e = make_entry(f)
+        conn.execute('DELETE FROM consumo WHERE fichero = ?', (f.name,))
+        conn.execute('INSERT OR REPLACE INTO consumo_ficheros VALUES (?, ?, ?, ?, ?, ?)', (
+            f.name,
+            e['inicio'].isoformat() if e else None,
+            e['fin'].isoformat() if e else None,
+            e['dias'] if e else None,
+            e['jueves'] if e else None,
+            int(df is not None),
+        ))
+        if df is not None:
+            conn.executemany('INSERT INTO consumo VALUES (?, ?, ?, ?, ?, ?)', zip(
+                [f.name] * len(df), range(len(df)), _column(df, 'Codigo'), _column(df, 'Articulo'),
+                _column(df, 'Unidad_de_Medida'), _column(df, 'Consumo')))
+        _set_signature(conn, key, sig)
+        imported += 1
+    return imported, len(removed)
+
+
+def _sync_sales(conn, base: Path):
+    est_dir = base / 'venta_estimada'
+    paths = [base / 'venta.xlsx'] + (sorted(est_dir.glob('*.csv')) if est_dir.exists() else [])
+    sig = _signature(paths)
+    if not _changed(conn, 'ventas', sig):
+        return False
+    conn.execute('DELETE FROM ventas')
+    for source, mapping in (('real', load_real_sales(base)), ('estimada', load_estimated_sales(base))):
+        days = [d for d in mapping if isinstance(d, date)]
+        conn.executemany('INSERT OR REPLACE INTO ventas VALUES (?, ?, ?)', zip(
+            [d.isoformat() for d in days], [source] * len(days), _py([mapping[d] for d in days])))
+    _set_signature(conn, 'ventas', sig)
+    return True
+
+
+def _sync_inventory(conn, base: Path):
+    """Foto nueva si inventario_real.csv ha cambiado. Si se ha borrado, foto sin fichero (el
+    cálculo usa entonces un inventario vacío, como sin la base)."""
+    path = base / 'inventario_actual' / 'inventario_real.csv'
+    sig = _signature([path])
+    if not _changed(conn, 'inventario', sig):
+        return False
+    if not path.exists():
+        conn.execute('INSERT INTO inventario_snapshots (fichero, modificado, importado) VALUES (NULL, NULL, ?)',
+                     (datetime.now().isoformat(timespec='seconds'),))
+        _set_signature(conn, 'inventario', sig)
+        return True
+    df = read_inventory(path)
+    modified = datetime.fromtimestamp(path.stat().st_mtime).isoformat(timespec='seconds')
+    cur = conn.execute('INSERT INTO inventario_snapshots (fichero, modificado, importado) VALUES (?, ?, ?)',
+                       (path.name, modified, datetime.now().isoformat(timespec='seconds')))
+    snapshot = cur.lastrowid
+    conn.executemany('INSERT INTO inventario VALUES (?, ?, ?, ?, ?, ?)', zip(
+        [snapshot] * len(df), range(len(df)), _column(df, 'Codigo'), _column(df, 'Articulo'),
+        _column(df, 'Unidad_de_Medida'), _column(df, 'Real')))
+    _set_signature(conn, 'inventario', sig)
+    return True
+
+
+def _prune_inventory(conn, keep):
+    """Borra las fotos de inventario más antiguas que las `keep` últimas."""
+    old = [r[0] for r in conn.execute('SELECT snapshot FROM inventario_snapshots ORDER BY snapshot DESC LIMIT -1 OFFSET ?',
+                                      (keep,))]
+    for snapshot in old:
+        conn.execute('DELETE FROM inventario WHERE snapshot = ?', (snapshot,))
+        conn.execute('DELETE FROM inventario_snapshots WHERE snapshot = ?', (snapshot,))
+    return len(old)
+
+
+def _sync_master(conn, base: Path):
+    updated = 0
+    for section in MASTER_SECTIONS:
+        folder = base / section
+        files = (list(folder.glob('*.xls')) + list(folder.glob('*.xlsx'))) if folder.exists() else []
+        key, sig = f'maestro/{section}', _signature(sorted(files))
+        if not _changed(conn, key, sig):
+            continue
+        rows = load_items_from_folder(folder)
+        conn.execute('DELETE FROM maestro WHERE seccion = ?', (section,))
+        conn.executemany('INSERT INTO maestro VALUES (?, ?, ?, ?, ?, ?, ?, ?)', [
+            (section, i, *_py([r.get(k) for k in MASTER_FIELDS]), r.get('Origen fichero'))
+            for i, r in enumerate(rows)])
+        _set_signature(conn, key, sig)
+        updated += 1
+    return updated
+
+
+def sync(base: Path, path: Path = None, master=True):
+    """Importa a la base de datos lo que haya cambiado en las carpetas de `base`. Devuelve los
+    recuentos: ficheros de consumo importados y borrados, si se recargaron las ventas, si hay
+    foto nueva de inventario y secciones del maestro recargadas. Con `master=False` no se mira el
+    maestro (para quien lo pasa ya cargado a `compute_order`)."""
+    base = Path(base)
+    with closing(connect(path or db_path(base))) as conn:
+        with conn:
+            imported, removed = _sync_consumo(conn, base / 'consumo_teorico')
+            inventory = _sync_inventory(conn, base)
+            if inventory:
+                _prune_inventory(conn, INVENTORY_SNAPSHOTS)
+            return {
+                'consumo': imported,
+                'consumo_borrados': removed,
+                'ventas': _sync_sales(conn, base),
+                'inventario': inventory,
+                'maestro': _sync_master(conn, base) if master else 0,
+            }
+
+
+# --- Consultas
+
+def load_sales(conn):
+    """(real, estimada): índices fecha -> valor, como `load_real_sales` / `load_estimated_sales`."""
+    out = {'real': {}, 'estimada': {}}
+    for fecha, fuente, valor in conn.execute('SELECT fecha, fuente, valor FROM ventas ORDER BY fecha'):
+        out[fuente][date.fromisoformat(fecha)] = np.nan if valor is None else valor
+    return out['real'], out['estimada']
+
+
+def sales_between(conn, start: date, end: date):
+    """Filas (fecha, fuente, valor) del rango [start, end]."""
+    return [(date.fromisoformat(f), src, v) for f, src, v in conn.execute(
+        'SELECT fecha, fuente, valor FROM ventas WHERE fecha BETWEEN ? AND ? ORDER BY fecha, fuente',
+        (start.isoformat(), end.isoformat()))]
+
+
+def consumo_files(conn, start: date = None, end: date = None):
+    """Nombres de los CSV de consumo ordenados; con `start`/`end`, solo los que tienen fecha y se
+    solapan con [start, end]."""
+    if start is None or end is None:
+        return [r[0] for r in conn.execute('SELECT fichero FROM consumo_ficheros ORDER BY fichero')]
+    return [r[0] for r in conn.execute(
+        'SELECT fichero FROM consumo_ficheros WHERE inicio <= ? AND fin >= ? ORDER BY fichero',
+        (end.isoformat(), start.isoformat()))]
+
+
+def consumo_for_code(conn, code, start: date = None, end: date = None):
+    """Consumo de un código por fichero (fichero, inicio, fin, consumo), opcionalmente solo en los
+    ficheros que se solapan con [start, end]."""
+    sql = ('SELECT c.fichero, f.inicio, f.fin, SUM(c.consumo) FROM consumo c '
+           'JOIN consumo_ficheros f ON f.fichero = c.fichero WHERE c.codigo = ?')
+    params = [code]
+    if start is not None and end is not None:
+        sql += ' AND f.inicio <= ? AND f.fin >= ?'
+        params += [end.isoformat(), start.isoformat()]
+    rows = conn.execute(sql + ' GROUP BY c.fichero ORDER BY c.fichero', params).fetchall()
+    return pd.DataFrame(rows, columns=['fichero', 'inicio', 'fin', 'consumo'])
+
+
+def load_cube(conn, names):
+    """Cubo de `scripts.consumo_cube` con el consumo de los ficheros `names`. El cubo tiene una
+    fila por cada fichero de la base (los no pedidos, vacíos) para que `aggregate` sume en el
+    mismo orden y con el mismo resultado que el cubo de la carpeta."""
+    wanted = sorted(set(names))
+    all_files = conn.execute('SELECT fichero, valido FROM consumo_ficheros ORDER BY fichero').fetchall()
+    tables = {}
+    if wanted:
+        marks = ','.join('?' * len(wanted))
+        rows = conn.execute(f'SELECT fichero, codigo, articulo, unidad, consumo FROM consumo '
+                            f'WHERE fichero IN ({marks}) ORDER BY fichero, fila', wanted).fetchall()
+        by_file = {}
+        for r in rows:
+            by_file.setdefault(r[0], []).append(r[1:])
+        for name, recs in by_file.items():
+            cols = list(zip(*recs))
+            tables[name] = pd.DataFrame({
+                'Codigo': _na(cols[0]), 'Articulo': _na(cols[1]), 'Unidad_de_Medida': _na(cols[2]),
+                'Consumo': np.asarray(cols[3], dtype=float)})
+    empty = pd.DataFrame({c: pd.Series(dtype=object) for c in KEY_COLS} | {'Consumo': pd.Series(dtype=float)})
+    return build_cube([name for name, _ in all_files],
+                      [tables.get(name, empty) if valid else None for name, valid in all_files])
+
+
+def load_inventory(conn, snapshot=None):
+    """Inventario (Codigo/Articulo/Unidad_de_Medida/Real) de la foto `snapshot` o de la última;
+    None si no hay ninguna o si en esa foto no había inventario_real.csv."""
+    if snapshot is None:
+        row = conn.execute('SELECT snapshot, fichero FROM inventario_snapshots ORDER BY snapshot DESC LIMIT 1').fetchone()
+    else:
+        row = conn.execute('SELECT snapshot, fichero FROM inventario_snapshots WHERE snapshot = ?', (snapshot,)).fetchone()
+    if row is None or row[1] is None:
+        return None
+    snapshot = row[0]
+    rows = conn.execute('SELECT codigo, articulo, unidad, real FROM inventario WHERE snapshot = ? ORDER BY fila',
+                        (snapshot,)).fetchall()
+    cols = list(zip(*rows)) if rows else [[], [], [], []]
+    return pd.DataFrame({'Codigo': _na(cols[0]), 'Articulo': _na(cols[1]), 'Unidad_de_Medida': _na(cols[2]),
+                         'Real': np.asarray(cols[3], dtype=float)})
+
+
+def load_master_rows(conn):
+    """Filas del maestro (dicts como `scripts.master.load_items_from_folder`), sección a sección."""
+    rows = []
+    order = {name: i for i, name in enumerate(MASTER_SECTIONS)}
+    recs = conn.execute('SELECT seccion, fila, nombre, codigo, unidades, medida, embalaje, origen FROM maestro').fetchall()
+    for rec in sorted(recs, key=lambda r: (order.get(r[0], len(order)), r[1])):
+        row = dict(zip(MASTER_FIELDS, _na(rec[2:7])))
+        row['Origen fichero'] = rec[7]
+        rows.append(row)
+    return rows
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='Sincroniza pedido.sqlite y consulta el histórico por rango y código.')
+    ap.add_argument('base', type=Path, nargs='?', default=Path('.'), help='carpeta de la tienda')
+    ap.add_argument('--db', type=Path, default=None, help='ruta de la base (por defecto <base>/pedido.sqlite)')
+    ap.add_argument('--codigo', help='consumo de este código por fichero')
+    ap.add_argument('--ventas', action='store_true', help='ventas reales y estimadas del rango')
+    ap.add_argument('--desde', type=date.fromisoformat, default=None)
+    ap.add_argument('--hasta', type=date.fromisoformat, default=None)
+    args = ap.parse_args(argv)
+
+    path = args.db or db_path(args.base)
+    print(f'{path}: {sync(args.base, path)}', file=sys.stderr)
+    with closing(connect(path)) as conn:
+        if args.codigo:
+            print(consumo_for_code(conn, args.codigo, args.desde, args.hasta).to_string(index=False))
+        if args.ventas:
+            if args.desde is None or args.hasta is None:
+                ap.error('--ventas necesita --desde y --hasta')
+            for day, source, value in sales_between(conn, args.desde, args.hasta):
+                print(f'{day.isoformat()}\t{source}\t{value}')
+        if not args.codigo and not args.ventas:
+            for name in consumo_files(conn, args.desde, args.hasta):
+                print(name)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,158 @@
+"""Lectura del maestro de productos a partir de los pedidos a proveedor (congelado/fresco/seco).
+
+En estos XLS el nombre del producto a veces ocupa una fila y el código, unidades, medida y
+embalaje la fila de debajo. `merge_split_rows` empareja esas filas de una vez con columnas
+desplazadas y máscaras booleanas (antes un `while` con `df.iloc[i]` fila a fila) y
+`units_per_pack` calcula Unidades_por_embalaje con aritmética de arrays.
+"""
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+HEADER_KEYWORDS = ['articulo', 'artículo', 'codigo', 'código', 'unid', 'unid. totales', 'unid. totales', 'medida', 'embalaje', 'nombre']
+NAME_CANDIDATES = ['Articulo', 'Artículo', 'Nombre']
+CODE_CANDIDATES = ['Codigo', 'Código', 'Cod']
+UNITS_CANDIDATES = ['Unid. Totales', 'Unid Totales', 'Unidades totales', 'Unidades', 'Total']
+MEASURE_CANDIDATES = ['Medida', 'Unidad_de_Medida', 'Unidad']
+PACK_CANDIDATES = ['Embalaje', 'Packaging', 'Envase']
+MASTER_FIELDS = ['Nombre', 'Codigo', 'Unidades totales', 'Medida', 'Embalaje']
+
+
+def read_order_sheet(path: Path):
+    path = Path(path)
+    try:
+        return pd.read_excel(path, header=None, engine='xlrd' if path.suffix.lower() == '.xls' else 'openpyxl')
+    except Exception:
+        return pd.read_excel(path, header=None)
+
+
+def detect_header_row(raw: pd.DataFrame) -> int:
+    """Primera fila (de las 40 primeras) con al menos dos palabras clave de cabecera; si no, 0."""
+    max_search = min(40, len(raw))
+    for i in range(max_search):
+        row_vals = [str(x).strip().lower() if pd.notna(x) else '' for x in raw.iloc[i].tolist()]
+        matches = sum(1 for h in HEADER_KEYWORDS if any(h in v for v in row_vals))
+        if matches >= 2:
+            return i
+    return 0
+
+
+def find_col(dfcols, candidates):
+    lower_map = {str(c).strip().lower(): c for c in dfcols}
+    for cand in candidates:
+        if cand.lower() in lower_map:
+            return lower_map[cand.lower()]
+    # try partial contains
+    for cand in candidates:
+        for lc, orig in lower_map.items():
+            if cand.lower() in lc or lc in cand.lower():
+                return orig
+    return None
+
+
+def _column(df: pd.DataFrame, col):
+    """Valores de la columna como array de objetos (None en todas las filas si no existe).
+    Con cabeceras repetidas se usa la primera columna con ese nombre."""
+    if col is None:
+        return np.full(len(df), None, dtype=object)
+    pos = int(np.flatnonzero(df.columns == col)[0])
+    return np.asarray(df.iloc[:, pos], dtype=object)
+
+
+def _texts(values):
+    return pd.Series(values, dtype=object).map(str).str.strip()
+
+
+def merge_split_rows(df: pd.DataFrame, name_col, code_col, units_col, measure_col, pack_col):
+    """Filas del maestro (dicts con MASTER_FIELDS) uniendo cada fila con solo nombre a la fila de
+    detalle siguiente, con el mismo criterio que el recorrido fila a fila:
+    - fila de nombre: código vacío (NaN, '' o 'nan'/'none') y nombre con valor verdadero
+    - fila de detalle: código o unidades con texto distinto de '', 'nan' y 'None'
+    Las parejas se forman de izquierda a derecha: en una racha de filas de nombre seguidas cada
+    una empareja con la siguiente, así que se emparejan las posiciones pares de la racha.
+    """
+    n = len(df)
+    if len(df.columns) and all(pd.api.types.is_numeric_dtype(t) for t in df.dtypes):
+        # como df.iloc[i]: con todas las columnas numéricas la fila toma el tipo común
+        df = df.astype(df.to_numpy().dtype)
+    names = _column(df, name_col)
+    codes = _column(df, code_col)
+    units = _column(df, units_col)
+    measures = _column(df, measure_col)
+    packs = _column(df, pack_col)
+    if n == 0:
+        return []
+
+    code_txt = _texts(codes)
+    code_empty = (pd.isna(codes) | (codes == '') | code_txt.str.lower().isin(['nan', 'none']).to_numpy())
+    # veracidad de Python (NaN cuenta como verdadero, '' y 0 no)
+    name_true = names.astype(bool)
+    detail = ((~pd.isna(codes) & ~code_txt.isin(['', 'nan', 'None']).to_numpy())
+              | (~pd.isna(units) & ~_texts(units).isin(['', 'nan', 'None']).to_numpy()))
+
+    cand = np.zeros(n, dtype=bool)
+    cand[:-1] = code_empty[:-1] & name_true[:-1] & detail[1:]
+    idx = np.arange(n)
+    last_break = np.maximum.accumulate(np.where(cand, -1, idx))
+    paired = cand & ((idx - last_break - 1) % 2 == 0)
+    consumed = np.zeros(n, dtype=bool)
+    consumed[1:] = paired[:-1]
+
+    keep = ~consumed
+    src = np.where(paired, idx + 1, idx)[keep]
+    return [dict(zip(MASTER_FIELDS, vals)) for vals in zip(
+        names[keep], codes[src], units[src], measures[src], packs[src])]
+
+
+def parse_order_sheet(raw: pd.DataFrame):
+    """Filas del maestro de una hoja leída sin cabecera."""
+    header_row = detect_header_row(raw)
+    header = raw.iloc[header_row].astype(str).tolist()
+    df = raw.iloc[header_row + 1:].copy()
+    df.columns = [str(c).strip() for c in header]
+    return merge_split_rows(
+        df,
+        find_col(df.columns, NAME_CANDIDATES),
+        find_col(df.columns, CODE_CANDIDATES),
+        find_col(df.columns, UNITS_CANDIDATES),
+        find_col(df.columns, MEASURE_CANDIDATES),
+        find_col(df.columns, PACK_CANDIDATES),
+    )
+
+
+def load_items_from_folder(folder: Path):
+    """Filas del maestro de todos los XLS/XLSX de `folder`, con 'Origen fichero'."""
+    out_rows = []
+    folder = Path(folder)
+    if not folder.exists():
+        return []
+    files = list(folder.glob('*.xls')) + list(folder.glob('*.xlsx'))
+    for f in files:
+        try:
+            raw = read_order_sheet(f)
+        except Exception:
+            continue
+        for row in parse_order_sheet(raw):
+            row['Origen fichero'] = f.name
+            out_rows.append(row)
+    return out_rows
+
+
+def units_per_pack(units, pack):
+    """Unidades por embalaje (unidades / embalaje): entero si es casi entero, si no redondeado a 4
+    decimales; None si falta alguno o el embalaje es 0. Mismo resultado que el cálculo por filas."""
+    index = getattr(units, 'index', None)
+    u = pd.to_numeric(pd.Series(np.asarray(units, dtype=object)), errors='coerce').to_numpy(dtype=float)
+    e = pd.to_numeric(pd.Series(np.asarray(pack, dtype=object)), errors='coerce').to_numpy(dtype=float)
+    valid = ~np.isnan(u) & ~np.isnan(e) & (e != 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        val = np.where(valid, u / np.where(valid, e, 1.0), np.nan)
+    near = valid & (np.abs(val - np.round(val)) < 1e-8)
+    out = [None] * len(val)
+    for i in np.flatnonzero(near):
+        out[i] = int(round(val[i]))
+    for i in np.flatnonzero(valid & ~near):
+        out[i] = round(float(val[i]), 4)
+    return pd.Series(out, index=index, dtype=None if out else float)
@@ -0,0 +1,587 @@
+"""Cálculo del pedido sin Streamlit.
+
+Es la lógica que hacía el botón "Calcular Pedido": selección de ficheros de consumo_teorico
+cuya venta se acerca a la del rango (con jueves), días extra de masas/topping (EQ) y harina
+(HAR), colchón del 20% y desperdicio del 4%, unidades por embalaje del maestro y redondeos.
+La app llama a `compute_order` y muestra los mensajes; desde cron se usa la línea de órdenes:
+
+    python -m scripts.order_engine --start 2026-02-02 --end 2026-02-09 --base . --out pedidos/
+
+que escribe las tablas (CSV o JSON) y un resumen.json. Todas las rutas se resuelven desde `base`.
+"""
+import argparse
+import json
+import math
+import sqlite3
+import sys
+import time
+from contextlib import closing
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import pandas as pd
+
+from scripts import local_db
+from scripts.consumo_catalog import build_catalog, entry, load_catalog, make_entry
+from scripts.consumo_cube import aggregate, load_cube
+from scripts.consumo_store import read_inventory
+from scripts.master import load_items_from_folder, units_per_pack
+from scripts.order_tables import CATEGORIES, finish_results
+from scripts.perf import profile_call, stage, total_seconds
+from scripts.product_codes import code_id, code_ids
+from scripts.sales_calendar import count_weekday, day_value, load_calendar, range_total
+from scripts.sales_utils import load_estimated_sales, load_real_sales, summarize_calendar
+from scripts.selector import select_subset
+
+
+MASTER_FOLDERS = ('congelado', 'fresco', 'seco')
+# masas (BF, BM, BP): 4 días extra; topping Mozzarella (EQ): 2 días extra
+EXTRA_DAYS_BY_CODE = {'BF': 4, 'BM': 4, 'BP': 4, 'EQ': 2}
+HAR_CODE = 'HAR'
+HAR_DAYS = 3
+# Inventario: desperdicio del 4% (disponible = Real * 0.96); Consumo: 20% extra (Consumo * 1.20)
+INV_WASTE = 0.04
+CONSUMO_EXTRA = 0.20
+
+
+def load_master_rows(base: Path):
+    """Filas del maestro de congelado/fresco/seco bajo `base`."""
+    rows = []
+    for name in MASTER_FOLDERS:
+        rows += load_items_from_folder(Path(base) / name)
+    return rows
+
+
+def _candidates(files, sales_cal, catalog=None):
+    """(fichero, fecha o rango, venta, tiene jueves) de los CSV con fecha en el nombre. Las fechas
+    y los jueves salen del catálogo (`scripts.consumo_catalog`) si se pasa."""
+    candidates = []
+    for f in files:
+        e = entry(catalog, f)
+        if e is None:
+            continue
+        if e['rango']:
+            start, end = e['inicio'], e['fin']
+            candidates.append((f, (start, end), range_total(sales_cal, start, end), e['jueves'] > 0))
+        else:
+            candidates.append((f, e['inicio'], day_value(sales_cal, e['inicio']), e['jueves'] > 0))
+    return candidates
+
+
+def _item_entries(candidates, required_thurs, catalog=None):
+    """Candidatos con su número de jueves (del catálogo si se pasa); si en total no llegan a
+    `required_thurs` se duplican ficheros de jueves de un solo día (los rangos no se duplican)."""
+    item_entries = []
+    active = []
+    for c in candidates:
+        f, d_or_r, v, has_th = c
+        # contar jueves dentro del propio fichero (no limitado al rango seleccionado)
+        if isinstance(d_or_r, tuple):
+            item_entries.append((f, d_or_r, v, entry(catalog, f)['jueves'], True))
+        else:
+            item_entries.append((f, d_or_r, v, 1 if d_or_r.weekday() == 3 else 0, False))
+        # la comprobación se hace tras cada candidato (como siempre ha hecho la app)
+        current_th_total = sum(it[3] for it in item_entries)
+        if current_th_total < required_thurs:
+            need = required_thurs - current_th_total
+            single_th_idxs = [i for i, it in enumerate(item_entries) if (not it[4]) and it[3] == 1]
+            if single_th_idxs:
+                # duplicados prefiriendo distintos archivos (round-robin)
+                idx_cycle = 0
+                while need > 0:
+                    item_entries.append(item_entries[single_th_idxs[idx_cycle % len(single_th_idxs)]])
+                    need -= 1
+                    idx_cycle += 1
+        active = item_entries
+    return active
+
+
+def _thursday_files(chosen_candidates):
+    """Nombres de los ficheros elegidos que aportan algún jueves (una vez por aparición)."""
+    out = []
+    for c in chosen_candidates:
+        try:
+            if len(c) >= 4 and isinstance(c[3], int):
+                thc = int(c[3])
+            else:
+                thc = entry(None, c[0])['jueves']
+            if thc > 0:
+                out.append(c[0].name)
+        except Exception:
+            pass
+    return out
+
+
+def _add_extra_days(agg, total, end, ests_map):
+    """Consumo de los días extra de masas/topping y harina, repartido según la venta estimada
+    de los días siguientes al rango. Devuelve (agg, summary_masas)."""
+    MASAS = set(EXTRA_DAYS_BY_CODE.keys())
+    extra_days = max(EXTRA_DAYS_BY_CODE.values())
+    extra_start = end + timedelta(days=1)
+    extra_dates = [extra_start + timedelta(days=i) for i in range(extra_days)]
+
+    masas_added_consumption = 0.0
+    agg['Codigo'] = agg['Codigo'].astype(str)
+
+    # venta estimada de los días extra según código (masas = 4 días, topping EQ = 2 días)
+    ests_extra_total_by_code = {}
+    for code, code_days in EXTRA_DAYS_BY_CODE.items():
+        code_total = 0.0
+        for d in extra_dates[:code_days]:
+            if d in ests_map:
+                code_total += float(ests_map[d])
+        ests_extra_total_by_code[code] = code_total
+    ests_extra_masas = float(ests_extra_total_by_code.get('BF', 0.0))
+    ests_extra_topping = float(ests_extra_total_by_code.get('EQ', 0.0))
+
+    masa_current_total = agg.loc[agg['Codigo'].isin(MASAS)]['Consumo'].sum()
+    masa_per_euro = masa_current_total / float(total) if total and total > 0 else 0.0
+
+    # consumo extra repartido por código según su participación actual
+    masas_added_detail = {}
+    if masa_current_total > 0:
+        shares = {}
+        for code in MASAS:
+            cval = float(agg.loc[agg['Codigo'] == code, 'Consumo'].sum()) if not agg.loc[agg['Codigo'] == code].empty else 0.0
+            shares[code] = cval / masa_current_total
+    else:
+        shares = {code: 1.0 / len(MASAS) for code in MASAS}
+
+    for code in MASAS:
+        code_per_euro = masa_per_euro * shares.get(code, 0)
+        added = ests_extra_total_by_code.get(code, 0.0) * code_per_euro
+        if any(agg['Codigo'] == code):
+            agg.loc[agg['Codigo'] == code, 'Consumo'] += added
+        else:
+            agg = pd.concat([agg, pd.DataFrame([{'Codigo': code, 'Articulo': '', 'Unidad_de_Medida': '', 'Consumo': added}])], ignore_index=True)
+        masas_added_consumption += added
+        masas_added_detail[code] = round(added, 2)
+
+    # Semola de roble (HAR): +3 días de consumo
+    har_sales_extra = 0.0
+    for d in extra_dates[:HAR_DAYS]:
+        if d in ests_map:
+            har_sales_extra += float(ests_map[d])
+    har_mask = pd.Series(code_ids(agg['Codigo']) == code_id(HAR_CODE), index=agg.index)
+    har_current_total = float(agg.loc[har_mask, 'Consumo'].sum()) if har_mask.any() else 0.0
+    har_per_euro = har_current_total / float(total) if total and total > 0 else 0.0
+    har_added_consumption = har_sales_extra * har_per_euro
+    if har_added_consumption > 0:
+        if har_mask.any():
+            if har_current_total > 0:
+                shares_har = agg.loc[har_mask, 'Consumo'] / har_current_total
+                agg.loc[har_mask, 'Consumo'] = agg.loc[har_mask, 'Consumo'] + (shares_har * har_added_consumption)
+            else:
+                n_har = int(har_mask.sum())
+                agg.loc[har_mask, 'Consumo'] = agg.loc[har_mask, 'Consumo'] + (har_added_consumption / max(1, n_har))
+        else:
+            agg = pd.concat([agg, pd.DataFrame([{
+                'Codigo': HAR_CODE,
+                'Articulo': 'SEMOLA DE ROBLE',
+                'Unidad_de_Medida': 'Kilogramo',
+                'Consumo': har_added_consumption,
+            }])], ignore_index=True)
+
+    summary_masas = {
+        'total_days': extra_days,
+        'per_product_days': extra_days,
+        'sales': ests_extra_masas + ests_extra_topping,
+        'sales_masas': ests_extra_masas,
+        'sales_topping': ests_extra_topping,
+        'har_days': HAR_DAYS,
+        'har_sales': har_sales_extra,
+        'har_consumo_added': har_added_consumption,
+        'consumo_added': masas_added_consumption,
+        'detail': masas_added_detail,
+    }
+    return agg, summary_masas
+
+
+def _round_half_up(x):
+    try:
+        f = float(x)
+    except Exception:
+        return x
+    if f - math.floor(f) >= 0.5:
+        return int(math.ceil(f))
+    return int(math.floor(f))
+
+
+def _drop_zz_yy(df):
+    """Máscara de artículos que empiezan por ZZ o YY (salvo el código GAMBC)."""
+    mask_drop = df['Articulo'].astype(str).str.upper().str.startswith(('ZZ', 'YY'), na=False)
+    return mask_drop & ~(code_ids(df['Codigo']) == code_id('GAMBC'))
+
+
+def _order_table(merged, master_rows, adj_pct):
+    consumo_adj = merged['Consumo'] * (1.0 + CONSUMO_EXTRA)
+    real_adj = merged['Real'] * (1.0 - INV_WASTE)
+    merged['Cantidad_a_pedir'] = ((consumo_adj - real_adj) * (1.0 + adj_pct)).clip(lower=0).round(2)
+    order_df = merged[['Codigo', 'Articulo', 'Unidad_de_Medida', 'Cantidad_a_pedir']]
+
+    # Unidades_por_embalaje desde el maestro (congelado/fresco/seco)
+    try:
+        if master_rows:
+            df_master_all = pd.DataFrame(master_rows)
+        else:
+            df_master_all = pd.DataFrame(columns=['Nombre', 'Codigo', 'Unidades totales', 'Medida', 'Embalaje', 'Origen fichero'])
+        try:
+            df_master_all['Unidades totales'] = pd.to_numeric(df_master_all['Unidades totales'].astype(str).str.replace(',', '.'), errors='coerce')
+            df_master_all['Embalaje'] = pd.to_numeric(df_master_all['Embalaje'].astype(str).str.replace(',', '.'), errors='coerce')
+            df_master_all['Unidades_por_embalaje'] = units_per_pack(df_master_all['Unidades totales'], df_master_all['Embalaje'])
+        except Exception:
+            df_master_all['Unidades_por_embalaje'] = None
+        # mapping por id de código (normalizado); con códigos repetidos gana el último
+        mapping = dict(zip(code_ids(df_master_all['Codigo']).tolist(), df_master_all['Unidades_por_embalaje'].tolist()))
+        mapping.pop(-1, None)
+        order_df['Unidades_por_embalaje'] = pd.Series(code_ids(order_df['Codigo']), index=order_df.index).map(mapping)
+    except Exception:
+        order_df['Unidades_por_embalaje'] = None
+
+    # enteros (0.5 hacia arriba) cuando la unidad es 'Bola' o 'Unidad'
+    try:
+        mask_round = order_df['Unidad_de_Medida'].astype(str).str.strip().str.lower().isin(['bola', 'unidad'])
+        if mask_round.any():
+            order_df.loc[mask_round, 'Cantidad_a_pedir'] = order_df.loc[mask_round, 'Cantidad_a_pedir'].apply(_round_half_up)
+    except Exception:
+        pass
+
+    if 'Articulo' in order_df.columns:
+        mask_drop = _drop_zz_yy(order_df)
+        if mask_drop.any():
+            order_df = order_df.loc[~mask_drop].reset_index(drop=True)
+    return order_df
+
+
+def _products_to_review(df_inv, agg, merged):
+    """Productos del inventario sin consumo, del consumo sin inventario y con consumo 0."""
+    try:
+        inv_codes = df_inv['Codigo'].astype(str).str.strip()
+        agg_codes = agg['Codigo'].astype(str).str.strip()
+        inv_part = df_inv.loc[~inv_codes.isin(agg_codes), ['Codigo', 'Articulo', 'Unidad_de_Medida', 'Real']].copy()
+        agg_only = agg.loc[~agg_codes.isin(inv_codes), ['Codigo', 'Articulo', 'Unidad_de_Medida', 'Consumo']].copy()
+        if not inv_part.empty:
+            inv_part['Consumo'] = 0.0
+            inv_part['Fuente'] = 'Inventario'
+        else:
+            inv_part = pd.DataFrame(columns=['Codigo', 'Articulo', 'Unidad_de_Medida', 'Real', 'Consumo', 'Fuente'])
+        if not agg_only.empty:
+            agg_only['Real'] = 0.0
+            agg_only['Fuente'] = 'Consumo agregado'
+        else:
+            agg_only = pd.DataFrame(columns=['Codigo', 'Articulo', 'Unidad_de_Medida', 'Consumo', 'Real', 'Fuente'])
+        cols = ['Codigo', 'Articulo', 'Unidad_de_Medida', 'Real', 'Consumo', 'Fuente']
+        prod_revisar = pd.concat([inv_part[cols], agg_only[cols]], ignore_index=True, sort=False)
+        if 'Articulo' in prod_revisar.columns:
+            mask_drop_rev = _drop_zz_yy(prod_revisar)
+            if mask_drop_rev.any():
+                prod_revisar = prod_revisar.loc[~mask_drop_rev].reset_index(drop=True)
+        try:
+            zeros = merged.loc[merged['Consumo'] == 0, ['Codigo', 'Articulo', 'Unidad_de_Medida', 'Real', 'Consumo']].copy()
+            if not zeros.empty:
+                zeros['Fuente'] = 'Consumo 0'
+                # evitar duplicados por Codigo (normalizando a str)
+                existing = prod_revisar['Codigo'].astype(str).str.strip().unique().tolist() if not prod_revisar.empty else []
+                zeros = zeros[~zeros['Codigo'].astype(str).str.strip().isin(existing)]
+                if not zeros.empty:
+                    prod_revisar = pd.concat([prod_revisar, zeros[cols]], ignore_index=True, sort=False)
+                    # filtro ZZ/YY otra vez para las filas nuevas (aquí sin excepción GAMBC)
+                    mask_drop_rev = prod_revisar['Articulo'].astype(str).str.upper().str.startswith(('ZZ', 'YY'), na=False)
+                    if mask_drop_rev.any():
+                        prod_revisar = prod_revisar.loc[~mask_drop_rev].reset_index(drop=True)
+        except Exception:
+            pass
+        return prod_revisar
+    except Exception:
+        return pd.DataFrame(columns=['Codigo', 'Articulo', 'Unidad_de_Medida', 'Real'])
+
+
+class _LocalDbError(Exception):
+    """Fallo al abrir o leer la base local (`compute_order` repite el cálculo desde las carpetas)."""
+
+
+def _db_read(func, *args):
+    """func(*args) sobre la base local; los errores de SQLite y de datos ilegibles (fechas,
+    texto mal codificado) se convierten en `_LocalDbError`."""
+    try:
+        return func(*args)
+    except (sqlite3.Error, ValueError) as e:
+        raise _LocalDbError(e) from e
+
+
+def compute_order(base: Path, start: date, end: date, avoid_thurs: bool = False, master_rows=None, timings=None,
+                  db=None):
+    """Pedido para el rango [start, end] con los datos de `base`.
+
+    Devuelve (results, messages). `results` es el dict que guarda la app en
+    session_state['last_results'] (ya con `finish_results`) o None si no hay selección posible;
+    `messages` es una lista de (nivel, texto) con nivel 'error', 'warning' o 'info'.
+    `master_rows` permite pasar el maestro ya cargado (si no, se lee de congelado/fresco/seco).
+    Los tiempos de cada etapa (`scripts.perf.stage`) se añaden a `timings` y quedan en
+    results['timings'].
+    Con `db` (ruta de la base de `scripts.local_db`, ya sincronizada con `local_db.sync`) las
+    ventas, el consumo, el inventario y el maestro se consultan en la base en lugar de leer las
+    carpetas. Si la base falla (no se puede abrir, datos ilegibles...) se calcula desde las
+    carpetas con un aviso (solo si falla la base: los errores del cálculo se propagan).
+    """
+    if db is None:
+        return _compute_order(Path(base), start, end, avoid_thurs, master_rows, timings, None)
+    done = len(timings) if timings is not None else 0
+    try:
+        with closing(_db_read(local_db.connect, db)) as conn:
+            return _compute_order(Path(base), start, end, avoid_thurs, master_rows, timings, conn)
+    except _LocalDbError as e:
+        # solo fallos al abrir o leer la base; cualquier otro error del cálculo se propaga
+        if timings is not None:
+            # las etapas medidas contra la base no cuentan
+            del timings[done:]
+        results, messages = _compute_order(Path(base), start, end, avoid_thurs, master_rows, timings, None)
+        messages.insert(0, ('warning', f'No se pudo usar la base local ({e}); se han leído las carpetas.'))
+        return results, messages
+
+
+def _compute_order(base: Path, start: date, end: date, avoid_thurs, master_rows, timings, conn):
+    messages = []
+    if timings is None:
+        timings = []
+    with stage(timings, 'ventas') as info:
+        if conn is None:
+            real_sales = load_real_sales(base)
+            ests_map = load_estimated_sales(base)
+        else:
+            real_sales, ests_map = _db_read(local_db.load_sales, conn)
+        sales_cal = load_calendar(real_sales, ests_map)
+        res = summarize_calendar(sales_cal, start, end)
+        info['dias'] = len(res['per_day'])
+    missing = [d for d, src, v in res['per_day'] if src == 'missing']
+    if missing:
+        missing_str = ', '.join([d.strftime('%Y-%m-%d') for d in missing])
+        messages.append(('error', f"Faltan datos (ni real ni estimada) para las siguientes fechas: {missing_str}"))
+
+    consumo_dir = base / 'consumo_teorico'
+    if not consumo_dir.exists():
+        messages.append(('info', 'No existe la carpeta consumo_teorico'))
+        return None, messages
+    with stage(timings, 'candidatos') as info:
+        if conn is None:
+            files = sorted(consumo_dir.glob('*.csv'))
+            catalog = load_catalog(consumo_dir)
+        else:
+            files = [consumo_dir / name for name in _db_read(local_db.consumo_files, conn)]
+            catalog = build_catalog(make_entry(f) for f in files)
+        # calendario diario con sumas acumuladas: total de cada fichero en O(1)
+        candidates = _candidates(files, sales_cal, catalog)
+        info.update(ficheros=len(files), candidatos=len(candidates))
+    if not candidates:
+        messages.append(('info', 'No hay ficheros en consumo_teorico con venta real asociada.'))
+        return None, messages
+
+    # objetivo: combinación de ficheros cuya suma de ventas se aproxime a res['total']
+    target = int(round(res['total'] * 100))
+    thursday_files = [c[0].name for c in candidates if c[3]]
+    non_thurs = [c for c in candidates if not c[3]]
+    required_thurs = count_weekday(start, end, 3)
+
+    with stage(timings, 'seleccion') as info:
+        if avoid_thurs:
+            if thursday_files and non_thurs:
+                messages.append(('info', f"Se evitarán los siguientes ficheros porque contienen jueves: {', '.join(thursday_files)}"))
+                active_candidates = non_thurs
+            elif thursday_files and not non_thurs:
+                messages.append(('info', "No hay alternativas sin jueves; se usarán todos los ficheros disponibles."))
+                active_candidates = candidates
+            else:
+                active_candidates = candidates
+        else:
+            # la selección debe tener tantos jueves como el rango
+            active_candidates = _item_entries(candidates, required_thurs, catalog)
+
+        vals = [int(round(c[2] * 100)) for c in active_candidates]
+        th_counts = [c[3] for c in active_candidates]
+        # primero cercanía en jueves y luego diferencia de ventas (ver scripts/selector.py)
+        best_idxs, best_th = select_subset(vals, th_counts, target, required_thurs)
+        info.update(candidatos=len(active_candidates), elegidos=len(best_idxs))
+    chosen_candidates = [active_candidates[i] for i in best_idxs]
+    chosen = [(c[0], c[1], c[2]) for c in chosen_candidates]
+    if not avoid_thurs:
+        try:
+            chosen_th_count = sum([c[3] for c in chosen_candidates])
+            if chosen_th_count < required_thurs:
+                if chosen_th_count == 0:
+                    messages.append(('error', f"Los ficheros consultados solo contienen 0 jueves mientras que el rango requiere {required_thurs} jueves."))
+                else:
+                    messages.append(('warning', f"Los ficheros consultados contienen {chosen_th_count} jueves mientras que el rango requiere {required_thurs} jueves. Se usarán datos disponibles."))
+        except Exception:
+            pass
+    if not chosen:
+        messages.append(('info', 'No se encontró una combinación útil de ficheros.'))
+        return None, messages
+
+    chosen_files = [c[0] for c in chosen]
+    chosen_thurs_files = _thursday_files(chosen_candidates)
+    chosen_sales_total = sum(c[2] for c in chosen)
+    diff_sales = chosen_sales_total - res['total']
+    # consumos desde el cubo fichero x producto (se construye una vez por estado de la carpeta)
+    with stage(timings, 'consumo', ficheros=len(chosen_files)) as info:
+        cube = load_cube(consumo_dir) if conn is None else _db_read(local_db.load_cube, conn, [p.name for p in chosen_files])
+        agg = aggregate(cube, chosen_files)
+        info.update(productos=len(cube['keys']), filas=0 if agg is None else len(agg))
+    if agg is None:
+        messages.append(('info', 'No se pudieron leer los ficheros elegidos.'))
+        return None, messages
+
+    with stage(timings, 'dias_extra'):
+        agg, summary_masas = _add_extra_days(agg, res['total'], end, ests_map)
+
+    with stage(timings, 'inventario') as info:
+        inv_path = base / 'inventario_actual' / 'inventario_real.csv'
+        df_inv = None
+        if conn is not None:
+            df_inv = _db_read(local_db.load_inventory, conn)
+        elif inv_path.exists():
+            # columna 'Real' ya numérica (0 si no existe)
+            df_inv = read_inventory(inv_path)
+        if df_inv is None:
+            df_inv = pd.DataFrame(columns=['Codigo', 'Articulo', 'Unidad_de_Medida', 'Real'])
+
+        merged = agg.merge(df_inv[['Codigo', 'Articulo', 'Unidad_de_Medida', 'Real']], on=['Codigo', 'Articulo', 'Unidad_de_Medida'], how='left')
+        merged['Real'] = merged['Real'].fillna(0)
+        merged['Consumo'] = merged['Consumo'].fillna(0)
+        info.update(filas=len(df_inv))
+    # ajuste según la diferencia entre la venta del rango y la de los ficheros (solo si >= 1%)
+    adj_pct = 0.0
+    try:
+        total_combined = float(res.get('total', 0) or 0)
+        if total_combined != 0:
+            raw_pct = (total_combined - float(chosen_sales_total or 0)) / total_combined
+            if abs(raw_pct) >= 0.01:
+                adj_pct = raw_pct
+    except Exception:
+        adj_pct = 0.0
+
+    if master_rows is None:
+        with stage(timings, 'maestro') as info:
+            master_rows = load_master_rows(base) if conn is None else _db_read(local_db.load_master_rows, conn)
+            info['filas'] = len(master_rows)
+    with stage(timings, 'pedido') as info:
+        order_df = _order_table(merged, master_rows, adj_pct)
+        prod_revisar = _products_to_review(df_inv, agg, merged)
+        info.update(filas=len(order_df), revisar=len(prod_revisar))
+
+    saved = {
+        'order_df': order_df,
+        'prod_revisar': prod_revisar,
+        'agg': agg,
+        'df_inv': df_inv,
+        'chosen_files': [p.name for p in chosen_files],
+        'chosen_thurs': chosen_thurs_files,
+        'summary_masas': summary_masas,
+        'summary': {
+            'total_real': res['total_real'] if 'total_real' in res else 0.0,
+            'total_estim_used': res['total_estim_used'] if 'total_estim_used' in res else 0.0,
+            'total': res['total'] if 'total' in res else 0.0,
+        },
+        'per_day': res.get('per_day'),
+        'chosen_sales_total': chosen_sales_total,
+        'diff_sales': diff_sales,
+        'timings': timings,
+    }
+    # colchón Pepsi, tablas por categoría, embalajes y tabla combinada
+    with stage(timings, 'tablas'):
+        results = finish_results(saved, base)
+    return results, messages
+
+
+def output_tables(results):
+    """Tablas a exportar: nombre de fichero -> DataFrame."""
+    tables = {'pedido': results['order_df'], 'productos_a_revisar': results['prod_revisar']}
+    for name in CATEGORIES:
+        tbl = results['tables'].get(name)
+        if tbl is not None:
+            tables[f'pedido_{name}'] = tbl
+    if results.get('combined') is not None:
+        tables['consumo_inventario'] = results['combined']
+    return tables
+
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+
+def write_outputs(results, messages, out_dir: Path, fmt='csv'):
+    """Escribe las tablas en `out_dir` (CSV o JSON) y resumen.json. Devuelve las rutas."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    written = []
+    if results is not None:
+        for name, df in output_tables(results).items():
+            if fmt == 'json':
+                path = out_dir / f'{name}.json'
+                df.to_json(path, orient='records', force_ascii=False, indent=2)
+            else:
+                path = out_dir / f'{name}.csv'
+                df.to_csv(path, index=False, encoding='utf-8')
+            written.append(path)
+    summary = {'messages': [{'level': lvl, 'text': txt} for lvl, txt in messages]}
+    if results is not None:
+        summary.update({
+            'summary': results['summary'],
+            'summary_masas': results['summary_masas'],
+            'chosen_files': results['chosen_files'],
+            'chosen_thurs': results['chosen_thurs'],
+            'chosen_sales_total': results['chosen_sales_total'],
+            'diff_sales': results['diff_sales'],
+            'per_day': [{'fecha': d, 'fuente': src, 'venta': v} for d, src, v in results['per_day'] or []],
+            'etapas': results.get('timings', []),
+            'total_segundos': total_seconds(results.get('timings')),
+        })
+    path = out_dir / 'resumen.json'
+    path.write_text(json.dumps(summary, ensure_ascii=False, indent=2, default=_json_default), encoding='utf-8')
+    written.append(path)
+    return written
+
+
+def _parse_date(text):
+    return date.fromisoformat(text)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='Calcula el pedido del camión sin la interfaz de Streamlit.')
+    ap.add_argument('--start', type=_parse_date, required=True, help='primer día del rango (AAAA-MM-DD)')
+    ap.add_argument('--end', type=_parse_date, required=True, help='último día del rango (AAAA-MM-DD)')
+    ap.add_argument('--base', type=Path, default=Path('.'), help='carpeta con consumo_teorico, inventario_actual, venta...')
+    ap.add_argument('--out', type=Path, required=True, help='carpeta de salida')
+    ap.add_argument('--format', choices=('csv', 'json'), default='csv')
+    ap.add_argument('--avoid-thursdays', action='store_true', help='evitar ficheros con jueves cuando sea posible')
+    ap.add_argument('--profile', action='store_true', help='perfilar con cProfile/tracemalloc (.prof e informe en --out)')
+    ap.add_argument('--db', nargs='?', type=Path, const=True, default=None,
+                    help='sincronizar y consultar la base SQLite (por defecto <base>/pedido.sqlite)')
+    args = ap.parse_args(argv)
+
+    t0 = time.perf_counter()
+    db = None
+    if args.db is not None:
+        db = local_db.db_path(args.base) if args.db is True else args.db
+        print(f'{db}: {local_db.sync(args.base, db)}', file=sys.stderr)
+    if args.profile:
+        (results, messages), report = profile_call(compute_order, args.base, args.start, args.end,
+                                                   avoid_thurs=args.avoid_thursdays, db=db, out_dir=args.out)
+        print(report['prof'], file=sys.stderr)
+        print(report['memoria'], file=sys.stderr)
+    else:
+        results, messages = compute_order(args.base, args.start, args.end, avoid_thurs=args.avoid_thursdays, db=db)
+    written = write_outputs(results, messages, args.out, args.format)
+    for lvl, txt in messages:
+        print(f'[{lvl}] {txt}', file=sys.stderr)
+    for path in written:
+        print(path)
+    print(f'{time.perf_counter() - t0:.2f} s', file=sys.stderr)
+    return 0 if results is not None else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
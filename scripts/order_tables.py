@@ -0,0 +1,182 @@
+"""Tablas finales del pedido, calculadas una sola vez al pulsar "Calcular Pedido".
+
+`render_saved_results` se ejecuta en cada rerun de Streamlit. Antes volvía a leer
+congelado.csv/fresco.csv, a repartir el pedido por categorías, a calcular los embalajes fila a
+fila y a multiplicar en el sitio la cantidad de las Pepsi (que crecía un 10% en cada rerun).
+`finish_results` hace todo eso una vez y guarda en los resultados las tablas terminadas; al
+pintar solo se eligen columnas/filas. Las tablas guardadas no se modifican después.
+"""
+import math
+import re
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from scripts.product_codes import code_ids, codes_mask, ids_for, normalize_codes
+
+
+PEPSI_CODES = {"PSPR1", "PSPR3", "PSPR5", "PSPZ1", "PSPZ5"}
+PEPSI_CUSHION_PCT = 10
+EXCLUDED_CODES = {"BSA"}
+# "Bebidas latas no pedir"
+LATAS_CODES = {"PSAL3", "PSAQN", "PSKLZ", "PSKNZ", "PSL7U", "PSLTZ", "PSPR3", "PSPZ3"}
+CATEGORY_FILES = {'congelado': 'congelado.csv', 'fresco': 'fresco.csv'}
+CATEGORIES = ('congelado', 'fresco', 'seco', 'bebidas_latas')
+# bolas de masa: se piden en múltiplos de la bandeja (código, patrón en el artículo, múltiplo)
+BALL_RULES = (
+    ('BF', re.compile(r'BOLA FAMILIAR'), 30),
+    ('BM', re.compile(r'BOLA MEDIANA'), 45),
+    ('BP', re.compile(r'BOLA\s+PEQUE.?A'), 50),
+)
+
+
+def apply_pepsi_cushion(order_df: pd.DataFrame) -> pd.DataFrame:
+    """Copia de `order_df` con el colchón extra de las Pepsi (redondeado hacia arriba)."""
+    out = order_df.copy()
+    if 'Codigo' not in out.columns or 'Cantidad_a_pedir' not in out.columns:
+        return out
+    mask_pepsi = codes_mask(out['Codigo'], PEPSI_CODES)
+    try:
+        vals = pd.to_numeric(out.loc[mask_pepsi, 'Cantidad_a_pedir'], errors='coerce').fillna(0).astype(float)
+        vals = vals * (1 + (PEPSI_CUSHION_PCT / 100))
+        out.loc[mask_pepsi, 'Cantidad_a_pedir'] = vals.apply(lambda x: int(math.ceil(x)))
+    except Exception:
+        # si hay problema, dejar los valores originales sin modificar
+        pass
+    return out
+
+
+def _category_codes(path: Path):
+    if not path.exists():
+        return set()
+    try:
+        df = pd.read_csv(path, encoding='utf-8')
+    except Exception:
+        df = pd.read_csv(path, encoding='latin-1')
+    if 'Codigo' not in df.columns:
+        return set()
+    return set(normalize_codes(df['Codigo']).dropna())
+
+
+def _nearest_multiple(q, base):
+    return int(base * math.floor((q / base) + 0.5))
+
+
+def compute_embalajes(df: pd.DataFrame) -> pd.DataFrame:
+    """Copia de `df` con 'Embalajes_a_pedir': bolas redondeadas al múltiplo de bandeja más
+    cercano y el resto ceil(Cantidad_a_pedir / Unidades_por_embalaje); None si no se puede."""
+    if 'Cantidad_a_pedir' not in df.columns:
+        return df
+    df = df.copy()
+    if 'Unidades_por_embalaje' not in df.columns:
+        df['Unidades_por_embalaje'] = None
+    qty = pd.to_numeric(df['Cantidad_a_pedir'], errors='coerce').to_numpy(dtype=float)
+    upe = pd.to_numeric(df['Unidades_por_embalaje'], errors='coerce').to_numpy(dtype=float)
+    codes = (df['Codigo'].astype(str).str.strip().str.upper() if 'Codigo' in df.columns
+             else pd.Series('', index=df.index))
+    arts = df['Articulo'].astype(str).str.upper() if 'Articulo' in df.columns else pd.Series('', index=df.index)
+    multiple = np.zeros(len(df))
+    for code, pattern, base in reversed(BALL_RULES):
+        is_ball = (codes == code).to_numpy(dtype=bool) | arts.str.contains(pattern, na=False).to_numpy(dtype=bool)
+        multiple[is_ball] = base
+    out = [None] * len(df)
+    for i in range(len(df)):
+        q = qty[i]
+        if not math.isfinite(q):
+            continue
+        if multiple[i]:
+            out[i] = _nearest_multiple(q, multiple[i])
+        elif not math.isnan(upe[i]) and upe[i] != 0:
+            val = q / upe[i]
+            if math.isfinite(val):
+                out[i] = int(math.ceil(val))
+    df['Embalajes_a_pedir'] = pd.Series(out, index=df.index, dtype=None if out else float)
+    return df
+
+
+def split_categories(order_df: pd.DataFrame, base: Path = Path('.')):
+    """Tablas congelado/fresco/seco/bebidas_latas (cantidad > 0, sin códigos excluidos) con
+    'Embalajes_a_pedir'. Los códigos de congelado/fresco salen de los CSV de `base`.
+    Dict vacío si el pedido no tiene Codigo/Cantidad_a_pedir."""
+    if 'Cantidad_a_pedir' not in order_df.columns or 'Codigo' not in order_df.columns:
+        return {}
+    odf = order_df
+    if not odf.empty:
+        odf = odf.loc[~codes_mask(odf['Codigo'], EXCLUDED_CODES)].reset_index(drop=True)
+    mask_positive = (pd.to_numeric(odf['Cantidad_a_pedir'], errors='coerce').fillna(0) > 0).to_numpy()
+    odf_ids = code_ids(odf['Codigo'])
+    mask_cong = np.isin(odf_ids, ids_for(_category_codes(Path(base) / CATEGORY_FILES['congelado'])))
+    mask_fres = np.isin(odf_ids, ids_for(_category_codes(Path(base) / CATEGORY_FILES['fresco'])))
+    mask_latas = np.isin(odf_ids, ids_for(LATAS_CODES))
+    masks = {
+        'congelado': mask_positive & mask_cong,
+        'fresco': mask_positive & mask_fres,
+        # las latas van en su propia tabla, no en 'Seco'
+        'seco': mask_positive & ~(mask_cong | mask_fres | mask_latas),
+        'bebidas_latas': mask_positive & mask_latas,
+    }
+    return {name: compute_embalajes(odf.loc[masks[name]].reset_index(drop=True)) for name in CATEGORIES}
+
+
+def combined_table(agg, df_inv):
+    """Tabla Codigo/Articulo/Unidad_de_Medida/Real/Consumo uniendo consumo agregado e inventario."""
+    df_agg = agg.copy() if hasattr(agg, 'copy') else (pd.DataFrame(agg) if agg is not None else None)
+    df_inv2 = df_inv.copy() if hasattr(df_inv, 'copy') else (pd.DataFrame(df_inv) if df_inv is not None else None)
+    if df_agg is None or df_agg.empty:
+        df_agg = pd.DataFrame(columns=['Codigo', 'Articulo', 'Unidad_de_Medida', 'Consumo'])
+    if df_inv2 is None or df_inv2.empty:
+        df_inv2 = pd.DataFrame(columns=['Codigo', 'Articulo', 'Unidad_de_Medida', 'Real'])
+
+    for d in (df_agg, df_inv2):
+        if 'Codigo' in d.columns:
+            d['Codigo'] = normalize_codes(d['Codigo'])
+
+    cols_agg = [c for c in ['Codigo', 'Articulo', 'Unidad_de_Medida', 'Consumo'] if c in df_agg.columns]
+    cols_inv = [c for c in ['Codigo', 'Articulo', 'Unidad_de_Medida', 'Real'] if c in df_inv2.columns]
+    merged = pd.merge(df_agg[cols_agg], df_inv2[cols_inv], on='Codigo', how='outer', suffixes=('_consumo', '_inv'))
+
+    # artículo/medida del inventario si existen
+    merged['Articulo'] = merged.get('Articulo_inv').fillna(merged.get('Articulo_consumo'))
+    merged['Unidad_de_Medida'] = merged.get('Unidad_de_Medida_inv').fillna(merged.get('Unidad_de_Medida_consumo'))
+    for c in ('Real', 'Consumo'):
+        if c not in merged.columns:
+            merged[c] = None
+    return merged[['Codigo', 'Articulo', 'Unidad_de_Medida', 'Real', 'Consumo']]
+
+
+def colchon_extra_label(summary, chosen_sales_total) -> str:
+    """' (+N%)' con la diferencia entre la venta del rango y la de los ficheros usados (si >= 1%)."""
+    try:
+        total = summary.get('total', 0) if summary else 0
+        if total:
+            raw_pct = (float(total) - float(chosen_sales_total or 0)) / float(total)
+            if abs(raw_pct) >= 0.01:
+                sign_pct = int(round(raw_pct * 100))
+                return f" ({'+' if sign_pct > 0 else ''}{sign_pct}%)"
+    except Exception:
+        pass
+    return ""
+
+
+def finish_results(results: dict, base: Path = Path('.')) -> dict:
+    """Resultados con el pedido ya ajustado y las tablas de presentación calculadas:
+    'order_df' (con colchón Pepsi), 'tables' (por categoría), 'combined' (None si falla la unión)
+    y 'colchon_extra_str'."""
+    out = dict(results)
+    order_df = results.get('order_df')
+    tables = {}
+    if order_df is not None:
+        order_df = apply_pepsi_cushion(order_df)
+        try:
+            tables = split_categories(order_df, base)
+        except Exception:
+            tables = {}
+    out['order_df'] = order_df
+    out['tables'] = tables
+    try:
+        out['combined'] = combined_table(results.get('agg'), results.get('df_inv'))
+    except Exception:
+        out['combined'] = None
+    out['colchon_extra_str'] = colchon_extra_label(results.get('summary'), results.get('chosen_sales_total', 0))
+    return out
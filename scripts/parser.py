@@ -1,11 +1,15 @@
 from pathlib import Path
 import re
 from datetime import datetime
+import numpy as np
 import pandas as pd
 
 
 UNIT_WORDS = ['Kilogramo', 'Bola', 'Litro', 'Gramo', 'Unidad']
 UNIT_RE = r"\b(" + "|".join(UNIT_WORDS) + r")\b"
+# Versión de la salida del parser: subirla cuando cambien las tablas generadas
+# (invalida las entradas de scripts/conversion_cache.py)
+PARSER_VERSION = 1
 
 
 def _read_excel_fallback(path: Path):
@@ -25,65 +29,153 @@ def _read_excel_fallback(path: Path):
             raise
 
 
-def extract_date(df: pd.DataFrame):
-    """Buscar la fecha de grabación en el DataFrame. Devuelve datetime o None."""
-    patterns = [
-        re.compile(r'Fecha de grabaci[oó]n\s*[:\-]?\s*(\d{1,2}/\d{1,2}/\d{4}\s*\d{1,2}:\d{2}:\d{2})', re.IGNORECASE),
-        re.compile(r'(\d{1,2}/\d{1,2}/\d{4}\s*\d{1,2}:\d{2}:\d{2})'),
-        re.compile(r'(\d{1,2}/\d{1,2}/\d{4})'),
-    ]
+# Fecha de grabación: patrones en el orden en que se prueban en cada celda
+DATE_PATTERNS = [
+    re.compile(r'Fecha de grabaci[oó]n\s*[:\-]?\s*(\d{1,2}/\d{1,2}/\d{4}\s*\d{1,2}:\d{2}:\d{2})', re.IGNORECASE),
+    re.compile(r'(\d{1,2}/\d{1,2}/\d{4}\s*\d{1,2}:\d{2}:\d{2})'),
+    re.compile(r'(\d{1,2}/\d{1,2}/\d{4})'),
+]
+DATE_FORMATS = ('%d/%m/%Y %H:%M:%S', '%d/%m/%Y')
+LABEL_DATE_FORMATS = ('%d/%m/%Y %H:%M:%S', '%d/%m/%Y', '%Y-%m-%d %H:%M:%S')
+# filtros previos (vectorizados) de celdas que pueden contener una fecha o la etiqueta
+_DATE_HINT_RE = r'\d{1,2}/\d{1,2}/\d{4}'
+_LABEL_HINT_RE = r'fecha\s+de\s+grabaci'
+# la fecha suele estar en la cabecera: primero se revisan estas filas y luego bloques crecientes
+HEADER_BAND_ROWS = 20
 
-    def norm(s):
+
+def _norm(s):
+    try:
+        return re.sub(r'\s+', ' ', str(s)).strip()
+    except Exception:
+        return ''
+
+
+def _row_bands(nrows: int):
+    start, size = 0, HEADER_BAND_ROWS
+    while start < nrows:
+        yield start, min(nrows, start + size)
+        start += size
+        size *= 4
+
+
+def _scan_band(df: pd.DataFrame, r0: int, r1: int):
+    """Localiza en las filas r0..r1 las celdas candidatas a contener una fecha y las que contienen
+    la etiqueta 'Fecha de grabación'. Devuelve dos listas de (fila, columna) en orden de lectura."""
+    block = df.iloc[r0:r1]
+    ncols = block.shape[1]
+    if block.size == 0:
+        return [], []
+    # celdas apiladas por filas como texto (str() de cada celda, igual que _norm)
+    texts = pd.Series(np.asarray(block, dtype=object).astype(str).ravel(), dtype=object)
+    date_idx = np.flatnonzero(texts.str.contains(_DATE_HINT_RE, regex=True).to_numpy(dtype=bool))
+    label_idx = np.flatnonzero(texts.str.contains(_LABEL_HINT_RE, case=False, regex=True).to_numpy(dtype=bool))
+    return ([(r0 + i // ncols, i % ncols) for i in date_idx],
+            [(r0 + i // ncols, i % ncols) for i in label_idx])
+
+
+def _date_in_cell(v):
+    """Primera fecha de la celda probando DATE_PATTERNS en orden (o None)."""
+    s = _norm(v)
+    if not s:
+        return None
+    for p in DATE_PATTERNS:
+        m = p.search(s)
+        if m:
+            found = m.group(1)
+            for fmt in DATE_FORMATS:
+                try:
+                    return datetime.strptime(found, fmt)
+                except Exception:
+                    continue
+    return None
+
+
+def _label_dates(df: pd.DataFrame, r: int, c: int, first_only: bool):
+    """Fechas en las 5 celdas a la derecha de una etiqueta 'Fecha de grabación' (texto o serial Excel)."""
+    res = []
+    cell = _norm(df.iat[r, c]).strip("'\"")
+    if 'fecha de grabaci' not in cell.lower():
+        return res
+    cols = df.shape[1]
+    for c2 in range(c + 1, min(cols, c + 6)):
+        v = df.iat[r, c2]
+        if v is None or (isinstance(v, float) and pd.isna(v)):
+            continue
+        # numeric serial
         try:
-            return re.sub(r'\s+', ' ', str(s)).strip()
+            if isinstance(v, (int, float)):
+                dt = pd.to_datetime(v, unit='D', origin='1899-12-30', errors='coerce')
+                if not pd.isna(dt):
+                    res.append(dt.to_pydatetime())
+                    if first_only:
+                        return res
         except Exception:
-            return ''
+            pass
+        s2 = _norm(v).strip("'\"")
+        for fmt in LABEL_DATE_FORMATS:
+            try:
+                res.append(datetime.strptime(s2, fmt))
+                if first_only:
+                    return res
+                break
+            except Exception:
+                continue
+    return res
 
-    # scan all cells generally for direct text dates
-    for val in df.values.flatten():
-        s = norm(val)
-        if not s:
-            continue
-        for p in patterns:
+
+def extract_date(df: pd.DataFrame):
+    """Buscar la fecha de grabación en el DataFrame. Devuelve datetime o None.
+
+    Recorre la hoja por bloques de filas empezando por la cabecera y se detiene en la primera
+    celda con fecha; solo si no hay ninguna usa las celdas junto a la etiqueta 'Fecha de grabación'.
+    """
+    label_cells = []
+    for r0, r1 in _row_bands(df.shape[0]):
+        date_cells, labels = _scan_band(df, r0, r1)
+        for r, c in date_cells:
+            found = _date_in_cell(df.iat[r, c])
+            if found is not None:
+                return found
+        label_cells += labels
+    for r, c in label_cells:
+        found = _label_dates(df, r, c, first_only=True)
+        if found:
+            return found[0]
+    return None
+
+
+def extract_all_dates(df: pd.DataFrame):
+    """Devuelve todas las fechas de grabación encontradas en el DataFrame (sin duplicados,
+    en orden de aparición) en una sola pasada. Lo usan los ficheros bulk para obtener inicio
+    y fin del rango."""
+    if df is None:
+        return []
+    res = []
+    date_cells, label_cells = _scan_band(df, 0, df.shape[0])
+    for r, c in date_cells:
+        s = _norm(df.iat[r, c])
+        # una celda con fecha y hora aporta ambas entradas (fecha-hora y fecha)
+        for p in DATE_PATTERNS[1:]:
             m = p.search(s)
             if m:
                 found = m.group(1)
-                # try to parse
-                for fmt in ('%d/%m/%Y %H:%M:%S', '%d/%m/%Y'):
+                for fmt in DATE_FORMATS:
                     try:
-                        return datetime.strptime(found, fmt)
+                        res.append(datetime.strptime(found, fmt))
+                        break
                     except Exception:
                         continue
-
-    # if not found, look for label cell 'Fecha de grabación' and check neighbors (e.g., excel serial in column D)
-    rows, cols = df.shape
-    for r in range(rows):
-        for c in range(cols):
-            cell = norm(df.iat[r, c]).strip("'\"")
-            if 'fecha de grabaci' in cell.lower():
-                # check right cells for date-like values or numeric excel serial
-                for c2 in range(c + 1, min(cols, c + 6)):
-                    v = df.iat[r, c2]
-                    if v is None or (isinstance(v, float) and pd.isna(v)):
-                        continue
-                    # numeric serial
-                    try:
-                        if isinstance(v, (int, float)):
-                            dt = pd.to_datetime(v, unit='d', origin='1899-12-30', errors='coerce')
-                            if not pd.isna(dt):
-                                return dt.to_pydatetime()
-                    except Exception:
-                        pass
-                    s2 = norm(v)
-                    # remove surrounding quotes
-                    s2 = s2.strip("'\"")
-                    # try direct parse
-                    for fmt in ('%d/%m/%Y %H:%M:%S', '%d/%m/%Y', '%Y-%m-%d %H:%M:%S'):
-                        try:
-                            return datetime.strptime(s2, fmt)
-                        except Exception:
-                            continue
-    return None
+    for r, c in label_cells:
+        res += _label_dates(df, r, c, first_only=False)
+    seen = set()
+    out = []
+    for d in res:
+        key = d.strftime('%Y-%m-%d %H:%M:%S')
+        if key not in seen:
+            seen.add(key)
+            out.append(d)
+    return out
 
 
 def parse_products(df: pd.DataFrame):
@@ -157,14 +249,10 @@ def parse_products(df: pd.DataFrame):
     return rows
 
 
-def parse_xls(path: Path):
-    """Lee el archivo y devuelve (fecha_datetime, pandas.DataFrame) o (None, None) si falla."""
-    df = _read_excel_fallback(path)
-    date = extract_date(df)
-    products = parse_products(df)
+def _products_to_frame(products):
+    """Construye el DataFrame de productos a partir de la lista de dicts de `parse_products`."""
     if not products:
-        return date, None
-    # build DataFrame, ensure consistent columns
+        return pd.DataFrame(columns=['Codigo', 'Articulo', 'Unidad_de_Medida'])
     all_cols = set()
     for p in products:
         all_cols.update(p.keys())
@@ -172,8 +260,67 @@ def parse_xls(path: Path):
     out_rows = []
     for p in products:
         out_rows.append([p.get(col, '') for col in cols])
-    out_df = pd.DataFrame(out_rows, columns=cols)
+    return pd.DataFrame(out_rows, columns=cols)
+
+
+def _text_col(col: pd.Series) -> pd.Series:
+    """Equivalente columnar de `norm()`: str(), espacios colapsados y strip."""
+    # np.asarray(...).astype(str) llama a str() en cada celda igual que la versión por filas
+    # (NaN -> 'nan', None -> 'None'), independientemente de la versión de pandas.
+    text = pd.Series(np.asarray(col, dtype=object).astype(str), index=col.index, dtype=object)
+    return text.str.replace(r'\s+', ' ', regex=True).str.strip()
+
+
+def parse_products_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Versión vectorizada de `parse_products`: opera por columnas con operaciones de texto
+    de pandas y devuelve directamente el DataFrame de productos (mismas columnas y valores
+    que `_products_to_frame(parse_products(df))`).
+    """
+    nrows, ncols = df.shape
+    if nrows == 0 or ncols == 0:
+        return pd.DataFrame(columns=['Codigo', 'Articulo', 'Unidad_de_Medida'])
+    df = df.reset_index(drop=True)
+    # solo las 12 primeras columnas intervienen en código, artículo y unidad
+    texts = [_text_col(df.iloc[:, c]) for c in range(min(ncols, 12))]
+    empty = pd.Series('', index=df.index, dtype=object)
+
+    code = texts[0].str.strip("'\"")
+    mask = code.str.fullmatch(r'[A-Z0-9\-]+').fillna(False).astype(bool)
+    if not mask.any():
+        return pd.DataFrame(columns=['Codigo', 'Articulo', 'Unidad_de_Medida'])
 
+    # artículo: columna 2 y, si está vacía, el primer valor no vacío de las columnas 1..5
+    article = texts[2] if ncols > 2 else empty
+    fallback = empty
+    for c in reversed(range(1, min(ncols, 6))):
+        fallback = texts[c].where(texts[c] != '', fallback)
+    article = article.where(article != '', fallback)
+    article = article.str.strip("'\"").str.replace(r'^\*+\s*', '', regex=True).str.strip()
+
+    # unidad: primera columna (de izquierda a derecha) que contenga alguna palabra de UNIT_WORDS;
+    # dentro de la columna gana la primera palabra de la lista
+    unit = empty
+    for c in reversed(range(len(texts))):
+        low = texts[c].str.lower()
+        col_unit = empty
+        for uw in reversed(UNIT_WORDS):
+            col_unit = col_unit.mask(low.str.contains(uw.lower(), regex=False), uw)
+        unit = unit.mask(col_unit != '', col_unit)
+
+    out = pd.DataFrame({
+        'Codigo': code[mask],
+        'Articulo': article[mask],
+        'Unidad_de_Medida': unit[mask],
+    })
+    # columnas extra (Col_N) desde la columna 3 en adelante, vacías -> ''
+    for c2 in range(3, ncols):
+        col = df.iloc[:, c2][mask]
+        out[f'Col_{c2 - 2}'] = col.astype(object).where(col.notna(), '')
+    return out.reset_index(drop=True).infer_objects()
+
+
+def _clean_products(out_df: pd.DataFrame) -> pd.DataFrame:
+    """Normaliza identificadores y recorta los decimales de las columnas Col_N."""
     # Helper to transform values: empty -> 0; if contains comma as decimal separator keep one digit after comma
     def transform_cell(v):
         if v is None:
@@ -214,4 +361,29 @@ def parse_xls(path: Path):
         else:
             out_df[col] = out_df[col].apply(transform_cell)
 
-    return date, out_df
+    return out_df
+
+
+def read_xls(path: Path, vectorized: bool = True):
+    """Lee el archivo una sola vez y devuelve (df_crudo, fecha_datetime, tabla_productos).
+
+    `df_crudo` es la hoja sin procesar, para extraer más datos (p. ej. `extract_all_dates`)
+    sin volver a leer el fichero. `tabla_productos` es None si no hay líneas de producto.
+    Por defecto usa el motor vectorizado `parse_products_frame`; `vectorized=False` usa el
+    recorrido por filas de `parse_products` (implementación de referencia).
+    """
+    df = _read_excel_fallback(path)
+    date = extract_date(df)
+    if vectorized:
+        out_df = parse_products_frame(df)
+    else:
+        out_df = _products_to_frame(parse_products(df))
+    if out_df.empty:
+        return df, date, None
+    return df, date, _clean_products(out_df)
+
+
+def parse_xls(path: Path, vectorized: bool = True):
+    """Lee el archivo y devuelve (fecha_datetime, pandas.DataFrame) o (None, None) si falla."""
+    _, date, table = read_xls(path, vectorized=vectorized)
+    return date, table
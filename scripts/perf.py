@@ -0,0 +1,175 @@
+"""Tiempos por etapa del cálculo del pedido.
+
+`stage` mide un bloque y lo añade a una lista de etapas (dicts con 'etapa', 'segundos' y los
+recuentos que se quieran: ficheros, filas...). La app muestra la lista en el panel
+"Rendimiento" de la barra lateral y `append_log` la guarda como una línea JSON en
+perf/etapas.jsonl; el panel muestra los últimos cálculos de ese fichero (`read_log`) para
+comparar ejecuciones.
+
+`profile_call` ejecuta una función bajo cProfile y tracemalloc (perfilado a demanda: variable de
+entorno PEDIDO_PROFILE=1 o la casilla del panel) y deja en perf/ el .prof y el informe de memoria.
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+
+PERF_DIR = Path('perf')
+TIMINGS_LOG = PERF_DIR / 'etapas.jsonl'
+# etapas.jsonl se rota al pasar de este tamaño; read_log(last=...) lee bloques desde el final
+LOG_MAX_BYTES = 5 * 1024 * 1024
+TAIL_BLOCK = 64 * 1024
+PROFILE_ENV = 'PEDIDO_PROFILE'
+PROFILE_TOP = 20
+
+
+@contextmanager
+def stage(timings, name, **counts):
+    """Mide el bloque y añade {'etapa', 'segundos', **recuentos} a `timings` (nada si es None).
+    Devuelve un dict donde el bloque puede apuntar recuentos: `info['filas'] = len(df)`."""
+    info = dict(counts)
+    if timings is None:
+        yield info
+        return
+    t0 = time.perf_counter()
+    try:
+        yield info
+    finally:
+        timings.append({'etapa': name, 'segundos': round(time.perf_counter() - t0, 6), **info})
+
+
+def total_seconds(timings):
+    return round(sum(t.get('segundos', 0.0) for t in timings or []), 6)
+
+
+def append_log(timings, path: Path = TIMINGS_LOG, **context):
+    """Añade una línea JSON con las etapas y el contexto (rango, tienda...). Devuelve la línea o
+    None si no se pudo escribir (el registro nunca debe romper el cálculo). Si el fichero pasa de
+    `LOG_MAX_BYTES` se renombra a etapas.jsonl.1 (sustituyendo al anterior) y se empieza otro."""
+    record = {'fecha': datetime.now().isoformat(timespec='seconds'), **context,
+              'total_segundos': total_seconds(timings), 'etapas': list(timings or [])}
+    try:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if path.exists() and path.stat().st_size >= LOG_MAX_BYTES:
+            path.replace(path.with_name(path.name + '.1'))
+        with path.open('a', encoding='utf-8') as fh:
+            fh.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+    except OSError:
+        return None
+    return record
+
+
+def _tail_lines(path: Path, count):
+    """Las `count` últimas líneas de `path`, leyendo el fichero desde el final por bloques."""
+    with path.open('rb') as fh:
+        fh.seek(0, os.SEEK_END)
+        pos = fh.tell()
+        data = b''
+        while pos > 0 and data.count(b'\n') <= count:
+            step = min(TAIL_BLOCK, pos)
+            pos -= step
+            fh.seek(pos)
+            data = fh.read(step) + data
+    lines = data.splitlines()
+    if pos > 0:
+        # la primera línea del bloque puede estar cortada
+        lines = lines[1:]
+    return lines[-count:]
+
+
+def read_log(path: Path = TIMINGS_LOG, last=None):
+    """Registros de `path` (los `last` últimos si se indica, leyendo solo el final del fichero);
+    se saltan las líneas corruptas."""
+    path = Path(path)
+    if not path.exists():
+        return []
+    if last:
+        lines = _tail_lines(path, last)
+    else:
+        lines = path.read_bytes().splitlines()
+    records = []
+    for line in lines:
+        try:
+            records.append(json.loads(line.decode('utf-8')))
+        except ValueError:
+            continue
+    return records
+
+
+def profiling_requested():
+    """True si la variable de entorno PEDIDO_PROFILE pide perfilar cada cálculo."""
+    return os.environ.get(PROFILE_ENV, '').strip().lower() not in ('', '0', 'false', 'no')
+
+
+def _hotspots(profiler, top):
+    """Las `top` funciones con más tiempo acumulado (incluidas las llamadas que hacen)."""
+    rows = []
+    for (filename, line, func), (cc, nc, tt, ct, _callers) in pstats.Stats(profiler).stats.items():
+        rows.append({
+            'funcion': func,
+            'fichero': f'{Path(filename).name}:{line}' if line else filename,
+            'llamadas': nc,
+            'acumulado_s': round(ct, 6),
+            'propio_s': round(tt, 6),
+        })
+    rows.sort(key=lambda r: r['acumulado_s'], reverse=True)
+    return rows[:top]
+
+
+def profile_call(func, *args, out_dir: Path = PERF_DIR, label='pedido', top=PROFILE_TOP, **kwargs):
+    """Ejecuta func(*args, **kwargs) con cProfile y tracemalloc. Devuelve (resultado, informe):
+    el informe tiene las rutas del .prof y del informe de memoria (.txt), el pico de memoria
+    y los `top` puntos calientes por tiempo acumulado. Si la función falla, la excepción sigue
+    su curso (sin informe)."""
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start(25)
+    elif hasattr(tracemalloc, 'reset_peak'):
+        tracemalloc.reset_peak()
+    profiler = cProfile.Profile()
+    t0 = time.perf_counter()
+    try:
+        result = profiler.runcall(func, *args, **kwargs)
+        seconds = time.perf_counter() - t0
+        snapshot = tracemalloc.take_snapshot()
+        _current, peak = tracemalloc.get_traced_memory()
+    finally:
+        if started_tracing:
+            tracemalloc.stop()
+
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    prof_path = out_dir / f'{label}-{stamp}.prof'
+    profiler.dump_stats(str(prof_path))
+
+    stats_txt = io.StringIO()
+    pstats.Stats(profiler, stream=stats_txt).sort_stats('cumulative').print_stats(top)
+    allocs = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    )).statistics('lineno')
+    lines = [f'Pico de memoria: {peak / 1024 / 1024:.1f} MiB', f'Tiempo: {seconds:.3f} s', '',
+             f'Top {top} asignaciones (memoria viva al terminar):']
+    lines += [f'{i + 1:>3}. {stat}' for i, stat in enumerate(allocs[:top])]
+    lines += ['', f'Top {top} funciones por tiempo acumulado:', stats_txt.getvalue()]
+    alloc_path = out_dir / f'{label}-{stamp}-memoria.txt'
+    alloc_path.write_text('\n'.join(lines), encoding='utf-8')
+
+    report = {
+        'prof': str(prof_path),
+        'memoria': str(alloc_path),
+        'segundos': round(seconds, 6),
+        'pico_mib': round(peak / 1024 / 1024, 3),
+        'hotspots': _hotspots(profiler, top),
+    }
+    return result, report
@@ -0,0 +1,78 @@
+"""Registro único de códigos de producto.
+
+Todos los códigos se comparan en su forma canónica: `str(codigo).strip().upper()` sin espacios.
+Cada valor bruto se normaliza una sola vez (memo por valor) y cada código canónico recibe un id
+entero estable mientras dure el proceso, así que las máscaras por código (Pepsi, categorías,
+HAR, GAMBC, mapeo con el maestro) son operaciones con arrays int32 en lugar de crear Series de
+texto nuevas en cada clic. Los valores vacíos (NaN/None) tienen id -1 y no coinciden con nada.
+
+Los ids solo valen dentro del proceso, así que no se guardan en las tablas de salida (que se
+exportan y se comparan con golden/): se calculan al hacer cada máscara o cruce. El memo de
+valores brutos se vacía al pasar de `RAW_LIMIT` entradas (los ids no cambian).
+"""
+import numpy as np
+import pandas as pd
+
+
+_IDS = {}      # código canónico -> id
+_CODES = []    # id -> código canónico
+_RAW = {}      # (tipo, valor bruto) -> id
+RAW_LIMIT = 100_000
+
+
+def normalize_code(value) -> str:
+    return str(value).strip().upper().replace(' ', '')
+
+
+def code_id(value) -> int:
+    """Id del código (lo registra si es nuevo); -1 para NaN/None."""
+    key = (type(value), value)
+    try:
+        return _RAW[key]
+    except KeyError:
+        pass
+    except TypeError:
+        # valores no hashables: sin memo
+        key = None
+    if value is None or (isinstance(value, float) and value != value):
+        cid = -1
+    else:
+        canon = normalize_code(value)
+        cid = _IDS.get(canon)
+        if cid is None:
+            cid = len(_CODES)
+            _IDS[canon] = cid
+            _CODES.append(canon)
+    if key is not None:
+        if len(_RAW) >= RAW_LIMIT:
+            _RAW.clear()
+        _RAW[key] = cid
+    return cid
+
+
+def code_ids(col) -> np.ndarray:
+    """Ids int32 de una columna de códigos (un lookup por valor distinto)."""
+    values = np.asarray(col, dtype=object)
+    codes, uniques = pd.factorize(values)
+    lookup = np.fromiter((code_id(u) for u in uniques), dtype=np.int32, count=len(uniques))
+    # factorize marca NaN con -1: la última posición de la tabla es -1
+    lookup = np.append(lookup, np.int32(-1))
+    return lookup[codes]
+
+
+def ids_for(codes) -> np.ndarray:
+    return np.array([code_id(c) for c in codes], dtype=np.int32)
+
+
+def codes_mask(col, codes) -> np.ndarray:
+    """Máscara booleana: filas de `col` cuyo código canónico está en `codes`."""
+    ids = code_ids(col)
+    wanted = ids_for(codes)
+    return np.isin(ids, wanted[wanted >= 0])
+
+
+def normalize_codes(col) -> pd.Series:
+    """Columna con los códigos en forma canónica (NaN para los vacíos), mismo índice que `col`."""
+    ids = code_ids(col)
+    table = np.array(_CODES + [np.nan], dtype=object)
+    return pd.Series(table[ids], index=getattr(col, 'index', None), dtype=object)
@@ -0,0 +1,130 @@
+"""Calendario diario de ventas con sumas acumuladas.
+
+Une ventas reales y estimadas en un array contiguo de un valor por día, con el origen de cada
+día (real, estimada o sin datos; la real tiene prioridad como en `summarize_range`) y sus sumas
+acumuladas. El total de cualquier rango, su reparto real/estimada y los días sin datos salen
+de restar dos posiciones en lugar de recorrer el rango día a día.
+
+Un día cuyo valor es NaN hace NaN cualquier total que lo incluya (igual que sumando en bucle),
+sin contaminar el resto de rangos.
+"""
+from datetime import date, timedelta
+
+import numpy as np
+
+
+MISSING, REAL, ESTIMADA = 0, 1, 2
+SOURCE_NAMES = {MISSING: 'missing', REAL: 'real', ESTIMADA: 'estimada'}
+
+_CACHE = {}
+
+
+def _cumsum0(arr):
+    out = np.zeros(len(arr) + 1, dtype=float)
+    np.cumsum(arr, out=out[1:])
+    return out
+
+
+def build_calendar(real, estim):
+    """Calendario (dict) a partir de los índices fecha -> valor de ventas reales y estimadas."""
+    days = [d for d in list(real) + list(estim) if isinstance(d, date)]
+    if not days:
+        start, n = date.today(), 0
+    else:
+        start = min(days)
+        n = (max(days) - start).days + 1
+    values = np.zeros(n, dtype=float)
+    source = np.full(n, MISSING, dtype=np.int8)
+    for mapping, src in ((estim, ESTIMADA), (real, REAL)):
+        for d, v in mapping.items():
+            if isinstance(d, date):
+                i = (d - start).days
+                values[i] = float(v)
+                source[i] = src
+    nan = np.isnan(values)
+    clean = np.where(nan, 0.0, values)
+    return {
+        'start': start,
+        'values': values,
+        'source': source,
+        'cum_real': _cumsum0(np.where(source == REAL, clean, 0.0)),
+        'cum_estim': _cumsum0(np.where(source == ESTIMADA, clean, 0.0)),
+        'cum_nan_real': _cumsum0(nan & (source == REAL)),
+        'cum_nan_estim': _cumsum0(nan & (source == ESTIMADA)),
+        'cum_missing': _cumsum0(source == MISSING),
+    }
+
+
+def load_calendar(real, estim):
+    """Calendario de `real`/`estim`, reutilizado mientras los loaders devuelvan los mismos índices
+    (`scripts.sales_utils` devuelve el mismo objeto hasta que cambian los ficheros)."""
+    key = (id(real), id(estim))
+    hit = _CACHE.get(key)
+    if hit is not None and hit[0] is real and hit[1] is estim:
+        return hit[2]
+    cal = build_calendar(real, estim)
+    _CACHE.clear()
+    _CACHE[key] = (real, estim, cal)
+    return cal
+
+
+def _bounds(cal, start: date, end: date):
+    """Posiciones [i, j) del rango dentro del calendario y número de días fuera de él."""
+    n = len(cal['values'])
+    total_days = max(0, (end - start).days + 1)
+    i = min(max((start - cal['start']).days, 0), n)
+    j = min(max((end - cal['start']).days + 1, 0), n)
+    j = max(i, j)
+    return i, j, total_days - (j - i)
+
+
+def _part(cal, cum, cum_nan, i, j):
+    if cal[cum_nan][j] - cal[cum_nan][i] > 0:
+        return float('nan')
+    return float(cal[cum][j] - cal[cum][i])
+
+
+def range_summary(cal, start: date, end: date):
+    """Totales del rango [start, end] (vacío si end < start)."""
+    i, j, outside = _bounds(cal, start, end)
+    total_real = _part(cal, 'cum_real', 'cum_nan_real', i, j)
+    total_estim = _part(cal, 'cum_estim', 'cum_nan_estim', i, j)
+    return {
+        'total_real': total_real,
+        'total_estim_used': total_estim,
+        'total': total_real + total_estim,
+        'missing_days': int(cal['cum_missing'][j] - cal['cum_missing'][i]) + outside,
+    }
+
+
+def range_total(cal, start: date, end: date) -> float:
+    return range_summary(cal, start, end)['total']
+
+
+def day_value(cal, d: date) -> float:
+    return range_total(cal, d, d)
+
+
+def per_day(cal, start: date, end: date):
+    """Lista (día, origen, valor) del rango, como la de `summarize_range`."""
+    out = []
+    cur = start
+    n = len(cal['values'])
+    while cur <= end:
+        i = (cur - cal['start']).days
+        if 0 <= i < n and cal['source'][i] != MISSING:
+            out.append((cur, SOURCE_NAMES[int(cal['source'][i])], float(cal['values'][i])))
+        else:
+            out.append((cur, 'missing', 0.0))
+        cur = cur + timedelta(days=1)
+    return out
+
+
+def count_weekday(start: date, end: date, weekday: int) -> int:
+    """Número de días de la semana `weekday` (0 = lunes) en [start, end]."""
+    if end < start:
+        return 0
+    first = start + timedelta(days=(weekday - start.weekday()) % 7)
+    if first > end:
+        return 0
+    return (end - first).days // 7 + 1
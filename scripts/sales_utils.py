@@ -1,48 +1,112 @@
 from pathlib import Path
+import numpy as np
 import pandas as pd
-from datetime import datetime, date, timedelta
+from datetime import date
+from types import MappingProxyType
 import re
 
+from scripts.sales_calendar import load_calendar, range_summary, per_day
+
 SPANISH_MONTHS = {
     'enero':1,'febrero':2,'marzo':3,'abril':4,'mayo':5,'junio':6,
     'julio':7,'agosto':8,'septiembre':9,'octubre':10,'noviembre':11,'diciembre':12
 }
 
 
-def parse_spanish_date(s: str):
-    if s is None:
-        return None
-    s = str(s).strip()
-    # try ISO/standard first
+def _parse_dates_column(texts: pd.Series):
+    """pd.to_datetime elemento a elemento (mismo criterio que con un escalar) sobre toda la columna."""
     try:
-        dt = pd.to_datetime(s, dayfirst=True, errors='coerce')
-        if not pd.isna(dt):
-            return dt.date()
-    except Exception:
-        pass
-    # match patterns like '27 enero 2026' or '1 febrero 2026'
-    m = re.search(r"(\d{1,2})\s+([A-Za-záéíóúñ]+)\s+(\d{4})", s)
-    if m:
-        day = int(m.group(1))
-        monname = m.group(2).lower()
-        year = int(m.group(3))
-        mon = SPANISH_MONTHS.get(monname)
-        if mon:
-            return date(year, mon, day)
-    # fallback: try direct pandas again with dayfirst
+        return pd.to_datetime(texts, dayfirst=True, errors='coerce', format='mixed')
+    except (TypeError, ValueError):
+        # pandas < 2.0 no tiene format='mixed' y ya infiere cada elemento por separado
+        return pd.to_datetime(texts, dayfirst=True, errors='coerce')
+
+
+def _spanish_dates(parts: pd.DataFrame):
+    """Fechas a partir de las columnas (día, mes en español, año) extraídas con SPANISH_DATE_RE."""
+    months = parts[1].str.lower().map(SPANISH_MONTHS)
+    return pd.to_datetime(
+        pd.DataFrame({'year': pd.to_numeric(parts[2]), 'month': months, 'day': pd.to_numeric(parts[0])}),
+        errors='coerce')
+
+
+SPANISH_DATE_RE = r"(\d{1,2})\s+([A-Za-záéíóúñ]+)\s+(\d{4})"
+
+
+def parse_spanish_dates(col: pd.Series):
+    """Fechas de la columna (dd/mm/aaaa, ISO o "27 enero 2026"): Series de `date` (NaN si no se reconoce)."""
+    texts = pd.Series(np.asarray(col, dtype=object).astype(str), index=col.index, dtype=object).str.strip()
+    parsed = pd.Series(pd.NaT, index=col.index, dtype='datetime64[ns]')
+    # celdas que son exactamente '27 enero 2026': pandas no las reconoce, así que se resuelven
+    # directamente con el mes en español sin pasar por el parser genérico (el caso habitual)
+    whole = np.array(texts.str.fullmatch(SPANISH_DATE_RE), dtype=bool)
+    if whole.any():
+        parts = texts[whole].str.extract(SPANISH_DATE_RE)
+        known = parts[1].str.lower().isin(SPANISH_MONTHS.keys()).to_numpy()
+        whole[whole] = known
+        parsed[whole] = _spanish_dates(parts[known])
+    rest = ~whole
+    if rest.any():
+        parsed[rest] = _parse_dates_column(texts[rest])
+    # texto con fecha en español dentro de otro contenido
+    todo = parsed.isna().to_numpy() & rest
+    if todo.any():
+        parsed[todo] = _spanish_dates(texts[todo].str.extract(SPANISH_DATE_RE))
+    out = pd.Series(None, index=col.index, dtype=object)
+    ok = parsed.notna().to_numpy()
+    out[ok] = parsed[ok].dt.date
+    return out
+
+
+def _to_float(x):
     try:
-        dt = pd.to_datetime(s, dayfirst=True, errors='coerce')
-        if not pd.isna(dt):
-            return dt.date()
+        return float(x)
     except Exception:
-        pass
-    return None
+        try:
+            s = str(x).replace(',', '.')
+            return float(re.sub(r'[^0-9\.-]', '', s))
+        except Exception:
+            return None
 
 
-def load_real_sales(base: Path):
-    f = base / 'venta.xlsx'
-    if not f.exists():
-        return {}
+def _to_float_values(col: pd.Series):
+    """Valores como float: pd.to_numeric y, donde no sirve, la cadena float() / limpiar texto
+    de siempre. Devuelve (valores, válidos); un NaN leído del CSV es un valor válido."""
+    if pd.api.types.is_numeric_dtype(col) and not pd.api.types.is_bool_dtype(col):
+        return col.to_numpy(dtype=float), np.ones(len(col), dtype=bool)
+    vals = pd.to_numeric(col, errors='coerce').to_numpy(dtype=float, copy=True)
+    ok = np.ones(len(col), dtype=bool)
+    for i in np.flatnonzero(np.isnan(vals)):
+        v = _to_float(col.iat[i])
+        if v is None:
+            ok[i] = False
+        else:
+            vals[i] = v
+    return vals, ok
+
+
+# Caché de ventas: cada fichero se lee una vez y se vuelve a leer solo si cambia su firma
+# (mtime, tamaño). Todos los llamadores reciben el mismo índice fecha -> valor de solo lectura
+# (MappingProxyType), así que no pueden modificarlo entre reruns. Las entradas de ficheros que
+# ya no existen se quitan cuando cambia la carpeta.
+_CACHE = {}
+
+
+def _signature(path: Path):
+    st = path.stat()
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _cached(key, sig, loader):
+    hit = _CACHE.get(key)
+    if hit is not None and hit[0] == sig:
+        return hit[1]
+    data = loader()
+    _CACHE[key] = (sig, data)
+    return data
+
+
+def _read_real_sales(f: Path):
     df = pd.read_excel(f)
     # expect columns 'fecha' and 'ventas'
     if 'fecha' not in df.columns or 'ventas' not in df.columns:
@@ -52,91 +116,89 @@ def load_real_sales(base: Path):
     df = df.dropna(subset=['fecha']).copy()
     df['date'] = df['fecha'].dt.date
     sales = df.groupby('date')['ventas'].sum().to_dict()
-    return sales
+    return MappingProxyType(sales)
+
+
+def load_real_sales(base: Path):
+    f = base / 'venta.xlsx'
+    if not f.exists():
+        _CACHE.pop(str(f.resolve()), None)
+        return MappingProxyType({})
+    return _cached(str(f.resolve()), _signature(f), lambda: _read_real_sales(f))
+
+
+def _read_estimated_file(f: Path):
+    """Fechas y valores de un CSV de venta_estimada (None si no se puede leer)."""
+    mapping = {}
+    try:
+        df = pd.read_csv(f)
+    except Exception:
+        return None
+    # find date and value columns
+    date_col = None
+    val_col = None
+    for c in df.columns:
+        lc = c.lower()
+        if 'fecha' in lc:
+            date_col = c
+        if 'venta' in lc and 'estim' in lc or 'venta'==lc or 'ventas'==lc or 'valor' in lc:
+            # prefer columna con 'estim' in name
+            val_col = c
+    # fallback heuristics
+    if date_col is None:
+        # try first col
+        date_col = df.columns[0]
+    if val_col is None:
+        # try second col
+        if len(df.columns) > 1:
+            val_col = df.columns[1]
+        else:
+            val_col = df.columns[0]
+    dates = parse_spanish_dates(df[date_col])
+    vals, ok = _to_float_values(df[val_col])
+    keep = dates.notna().to_numpy() & ok
+    # filas posteriores con la misma fecha sustituyen a las anteriores (como el bucle por filas)
+    mapping.update(zip(dates[keep].tolist(), vals[keep].tolist()))
+    return mapping
 
 
 def load_estimated_sales(base: Path):
     dirp = base / 'venta_estimada'
     if not dirp.exists():
-        return {}
-    mapping = {}
-    for f in dirp.glob('*.csv'):
-        try:
-            df = pd.read_csv(f)
-        except Exception:
-            continue
-        # find date and value columns
-        cols = [c.lower() for c in df.columns]
-        date_col = None
-        val_col = None
-        for c in df.columns:
-            lc = c.lower()
-            if 'fecha' in lc:
-                date_col = c
-            if 'venta' in lc and 'estim' in lc or 'venta'==lc or 'ventas'==lc or 'valor' in lc:
-                # prefer columna con 'estim' in name
-                val_col = c
-        # fallback heuristics
-        if date_col is None:
-            # try first col
-            date_col = df.columns[0]
-        if val_col is None:
-            # try second col
-            if len(df.columns) > 1:
-                val_col = df.columns[1]
-            else:
-                val_col = df.columns[0]
-        for _, row in df.iterrows():
-            raw = row[date_col]
-            d = parse_spanish_date(raw)
-            if d is None:
-                # try pandas parse
-                try:
-                    dtmp = pd.to_datetime(raw, dayfirst=True, errors='coerce')
-                    if not pd.isna(dtmp):
-                        d = dtmp.date()
-                except Exception:
-                    d = None
-            if d is None:
-                continue
-            try:
-                val = float(row[val_col])
-            except Exception:
-                try:
-                    s = str(row[val_col]).replace(',', '.')
-                    val = float(re.sub(r'[^0-9\.-]','', s))
-                except Exception:
-                    continue
-            mapping[d] = val
-    return mapping
+        folder = dirp.resolve()
+        for key in [k for k in _CACHE if k == str(folder) or Path(k).parent == folder]:
+            del _CACHE[key]
+        return MappingProxyType({})
+    files = list(dirp.glob('*.csv'))
+    sigs = tuple((f.name, _signature(f)) for f in files)
+
+    def _merge():
+        # la carpeta cambió: fuera de la caché los ficheros borrados o renombrados
+        folder, current = dirp.resolve(), {str(f.resolve()) for f in files}
+        for key in [k for k in _CACHE if Path(k).parent == folder and k not in current]:
+            del _CACHE[key]
+        mapping = {}
+        for f, (_, sig) in zip(files, sigs):
+            part = _cached(str(f.resolve()), sig, lambda: _read_estimated_file(f))
+            if part is not None:
+                mapping.update(part)
+        return MappingProxyType(mapping)
+    return _cached(str(dirp.resolve()), sigs, _merge)
 
 
 def summarize_range(base: Path, start: date, end: date):
-    real = load_real_sales(base)
-    estim = load_estimated_sales(base)
+    return summarize_calendar(load_calendar(load_real_sales(base), load_estimated_sales(base)), start, end)
+
+
+def summarize_calendar(cal, start: date, end: date):
+    """Ventas por día y totales real/estimada del rango a partir de un calendario ya cargado."""
     # ensure start <= end
     if start > end:
         start, end = end, start
-    current = start
-    per_day = []
-    total_real = 0.0
-    total_estim_used = 0.0
-    while current <= end:
-        if current in real:
-            val = float(real[current])
-            per_day.append((current, 'real', val))
-            total_real += val
-        elif current in estim:
-            val = float(estim[current])
-            per_day.append((current, 'estimada', val))
-            total_estim_used += val
-        else:
-            per_day.append((current, 'missing', 0.0))
-        current = current + timedelta(days=1)
-    total = total_real + total_estim_used
+    summary = range_summary(cal, start, end)
     return {
-        'per_day': per_day,
-        'total_real': total_real,
-        'total_estim_used': total_estim_used,
-        'total': total
+        'per_day': per_day(cal, start, end),
+        'total_real': summary['total_real'],
+        'total_estim_used': summary['total_estim_used'],
+        'total': summary['total']
     }
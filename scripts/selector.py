@@ -0,0 +1,176 @@
+"""Selección exacta de ficheros de consumo para "Calcular Pedido".
+
+Dado un valor (ventas en céntimos) y un número de jueves por candidato, se busca el subconjunto
+que minimiza, en este orden:
+1. la distancia entre los jueves del subconjunto y los jueves requeridos,
+2. la diferencia absoluta entre la suma de ventas y el objetivo.
+Si hay empate se devuelve el subconjunto de máscara más baja (el primero que encontraba la
+enumeración de 2^n máscaras que se usaba antes), así que para pocos candidatos el resultado es
+idéntico al de la búsqueda exhaustiva.
+
+Método: programación dinámica sobre (jueves, céntimos) guardando, por cada número de jueves, las
+sumas alcanzables como bits de un entero de Python (desplazar + OR por candidato). Las sumas se
+limitan a 2 * objetivo: por encima la diferencia ya es peor que la de no elegir nada en esa capa;
+para capas sin sumas en ese rango se usa la suma mínima de la capa (se calcula aparte). La
+reconstrucción decide los candidatos del último al primero guardando los prefijos de la DP solo
+en puntos de control (cada ~sqrt(n) candidatos) y recalculando el bloque que se necesita.
+
+Con pocos candidatos (n <= SMALL_N) es más rápido enumerar las 2^n máscaras con NumPy: sumas y
+jueves de todas las máscaras por duplicación de arrays int64 y un argmin vectorizado.
+"""
+import math
+
+import numpy as np
+
+
+SMALL_N = 20
+
+
+def _shift_layers(layers, v, t, cap_mask, max_th=None):
+    """Prefijo siguiente: capas de `layers` unidas a las mismas desplazadas por (t, v).
+    Con `max_th` se descartan las capas por encima (solo válido si ningún t es negativo)."""
+    out = dict(layers)
+    for th, bits in layers.items():
+        if max_th is not None and th + t > max_th:
+            continue
+        moved = (bits << v) & cap_mask
+        if moved:
+            out[th + t] = out.get(th + t, 0) | moved
+    return out
+
+
+def _nearest(bits, target):
+    """Sumas alcanzables más cercanas a `target` por debajo y por encima (None si no hay)."""
+    below = above = None
+    if target >= 0:
+        low = bits & ((1 << (target + 1)) - 1)
+        if low:
+            below = low.bit_length() - 1
+        high = bits >> target
+        if high:
+            above = target + (high & -high).bit_length() - 1
+    elif bits:
+        above = (bits & -bits).bit_length() - 1
+    return below, above
+
+
+def _select_small(values, th_counts, target, required_th):
+    """Enumeración de las 2^n máscaras: la máscara m está en la posición m de los arrays."""
+    n = len(values)
+    size = 1 << n
+    sums = np.zeros(size, dtype=np.int64)
+    ths = np.zeros(size, dtype=np.int64)
+    for i, (v, t) in enumerate(zip(values, th_counts)):
+        half = 1 << i
+        np.add(sums[:half], v, out=sums[half:2 * half])
+        np.add(ths[:half], t, out=ths[half:2 * half])
+    # distancias en jueves y en ventas, calculadas en el sitio (2^n elementos)
+    np.subtract(ths, required_th, out=ths)
+    np.abs(ths, out=ths)
+    np.subtract(sums, target, out=sums)
+    np.abs(sums, out=sums)
+    sums[ths != ths.min()] = np.iinfo(np.int64).max
+    # argmin devuelve la primera posición: en empate, la máscara más baja
+    mask = int(np.argmin(sums))
+    idxs = [i for i in range(n) if mask >> i & 1]
+    return idxs, sum(th_counts[i] for i in idxs)
+
+
+def select_subset(values, th_counts, target, required_th):
+    """Índices (ascendentes) del mejor subconjunto y su número de jueves.
+
+    `values` y `target` son enteros (céntimos); `th_counts` enteros (jueves por candidato).
+    Los valores negativos se admiten: el candidato se trata como incluido de base y la DP
+    decide si quitarlo.
+    """
+    values = [int(v) for v in values]
+    th_counts = [int(t) for t in th_counts]
+    if len(values) <= SMALL_N:
+        return _select_small(values, th_counts, int(target), int(required_th))
+    return _select_dp(values, th_counts, int(target), int(required_th))
+
+
+def _select_dp(values, th_counts, target, required_th):
+    n = len(values)
+    # candidatos con valor negativo: se parte de tenerlos incluidos y la DP 'quita' con valor -v
+    flipped = [v < 0 for v in values]
+    base_s = sum(v for v in values if v < 0)
+    base_t = sum(t for t, f in zip(th_counts, flipped) if f)
+    dv = [-v if f else v for v, f in zip(values, flipped)]
+    dt = [-t if f else t for t, f in zip(th_counts, flipped)]
+    goal = int(target) - base_s
+
+    # suma mínima por número de jueves (sin límite de céntimos)
+    min_sum = {0: 0}
+    for v, t in zip(dv, dt):
+        nxt = dict(min_sum)
+        for th, s in min_sum.items():
+            if th + t not in nxt or s + v < nxt[th + t]:
+                nxt[th + t] = s + v
+        min_sum = nxt
+
+    best_dist = min(abs(required_th - (base_t + th)) for th in min_sum)
+    best_layers = [th for th in min_sum if abs(required_th - (base_t + th)) == best_dist]
+
+    # DP limitada a 2 * objetivo y, si los jueves solo suman, a las capas que interesan
+    max_th = max(best_layers) if all(t >= 0 for t in dt) else None
+    cap = max(2 * goal, -1)
+    cap_mask = (1 << (cap + 1)) - 1
+    layers = {0: 1 & cap_mask} if cap >= 0 else {}
+    for v, t in zip(dv, dt):
+        if layers:
+            layers = _shift_layers(layers, v, t, cap_mask, max_th)
+
+    options = []
+    for th in best_layers:
+        bits = layers.get(th, 0)
+        if bits:
+            below, above = _nearest(bits, goal)
+            options += [(th, s) for s in (below, above) if s is not None]
+        else:
+            options.append((th, min_sum[th]))
+    best_diff = min(abs(s - goal) for _, s in options)
+    pending = {o for o in options if abs(o[1] - goal) == best_diff}
+
+    # reconstrucción: máscara mínima = decidir del último candidato al primero,
+    # prefiriendo dejar el candidato original fuera (con valor negativo: dejarlo dentro)
+    s_max = max(s for _, s in pending)
+    rec_mask = (1 << (s_max + 1)) - 1
+    block = max(1, math.isqrt(n))
+    checkpoints = {0: {0: 1}}
+    cur = {0: 1}
+    for k, (v, t) in enumerate(zip(dv, dt), start=1):
+        cur = _shift_layers(cur, v, t, rec_mask, max_th)
+        if k % block == 0 and k < n:
+            checkpoints[k] = cur
+
+    def reachable(prefix, pair):
+        th, s = pair
+        return s >= 0 and (prefix.get(th, 0) >> s) & 1
+
+    chosen_dp = [False] * n
+    i = n - 1
+    while i >= 0:
+        start = (i // block) * block
+        prefixes = [checkpoints[start]]
+        for k in range(start, i):
+            prefixes.append(_shift_layers(prefixes[-1], dv[k], dt[k], rec_mask, max_th))
+        # prefixes[j] = DP con los candidatos 0..start+j-1
+        for k in range(i, start - 1, -1):
+            prefix = prefixes[k - start]
+            without = {p for p in pending if reachable(prefix, p)}
+            with_it = {(th - dt[k], s - dv[k]) for th, s in pending}
+            with_it = {p for p in with_it if reachable(prefix, p)}
+            prefer_take = flipped[k]
+            if prefer_take and with_it:
+                take = True
+            elif not prefer_take and without:
+                take = False
+            else:
+                take = bool(with_it)
+            chosen_dp[k] = take
+            pending = with_it if take else without
+        i = start - 1
+
+    idxs = [k for k in range(n) if chosen_dp[k] != flipped[k]]
+    return idxs, sum(th_counts[k] for k in idxs)